@@ -0,0 +1,259 @@
+# benchmarks for the hot paths of the game: bird physics, collisions, neural networks, a whole generation and drawing
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # runs without a display (must be set before pygame is imported)
+
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+
+LOCAL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+import numpy as np
+import pygame
+import neat
+import flappBird
+import champion
+
+'''
+Every benchmark is a function that takes a seed, prepares its workload and returns (workload, ops):
+- workload is a function without arguments that runs the code path we want to time, once.
+- ops is how many "operations" (bird moves, collision tests, network activations, frames...) one call of workload does.
+The workload is timed repeat times and we report the median and the 95th percentile of those times, and the number of
+operations per second based on the median. Every workload uses fixed seeds, so all runs time exactly the same work.
+'''
+
+CONFIG_PATH = os.path.join(LOCAL_DIR, "config-feedforward.txt")
+
+def load_config():
+    return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                              neat.DefaultSpeciesSet, neat.DefaultStagnation, CONFIG_PATH)
+
+def make_genomes(config, size, hidden, seed): # size random genomes with hidden extra nodes each
+    random.seed(seed)
+    genomes = []
+    for key in range(size):
+        g = neat.DefaultGenome(key)
+        g.configure_new(config.genome_config)
+        for _ in range(hidden):
+            g.mutate_add_node(config.genome_config)
+        genomes.append((key, g))
+    return genomes
+
+def random_jumps(size, frames, seed): # which birds jump in which frame, about one jump every 10 frames
+    return np.random.RandomState(seed).random_sample((frames, size)) < 0.1
+
+def bench_bird_move(size): # Bird.move() of size Bird objects, one frame
+    def prepare(seed):
+        birds = [flappBird.Bird(230, 350) for _ in range(size)]
+        jumps = random_jumps(size, 1, seed)[0].tolist()
+        def workload():
+            for bird, jump in zip(birds, jumps):
+                bird.move()
+                if jump:
+                    bird.jump()
+        return workload, size
+    return prepare
+
+def bench_flock_move(size): # Flock.move() of a flock of size birds, one frame
+    def prepare(seed):
+        birds = flappBird.Flock(size, 230, 350)
+        jumps = random_jumps(size, 1, seed)[0]
+        def workload():
+            birds.move()
+            birds.jump(jumps)
+        return workload, size
+    return prepare
+
+def bench_pipe_collide(pairs): # Pipe.collide() for pairs random (pipe, bird) pairs, around the pipe so that the pixel test runs
+    def prepare(seed):
+        rng = random.Random(seed)
+        tests = []
+        for _ in range(pairs):
+            pipe = flappBird.Pipe(rng.randrange(180, 280), rng)
+            bird = flappBird.Bird(230, rng.uniform(pipe.height - 100, pipe.bottom + 50))
+            bird.img = rng.choice(bird.IMGS)
+            tests.append((pipe, bird))
+        def workload():
+            for pipe, bird in tests:
+                pipe.collide(bird)
+        return workload, pairs
+    return prepare
+
+def bench_collide_flock(size): # Pipe.collide_flock() for a flock of size birds spread over the screen
+    def prepare(seed):
+        rng = random.Random(seed)
+        pipe = flappBird.Pipe(220, rng)
+        birds = flappBird.Flock(size, 230, 350)
+        birds.y = np.random.RandomState(seed).uniform(0, 700, size)
+        def workload():
+            pipe.collide_flock(birds)
+        return workload, size
+    return prepare
+
+def bench_activate(hidden, size=100): # FeedForwardNetwork.activate() of size networks with hidden extra nodes each
+    def prepare(seed):
+        config = load_config()
+        nets = [neat.nn.FeedForwardNetwork.create(g, config) for _, g in make_genomes(config, size, hidden, seed)]
+        inputs = np.random.RandomState(seed).uniform(0, 700, (size, 3)).tolist()
+        def workload():
+            for net, x in zip(nets, inputs):
+                net.activate(x)
+        return workload, size
+    return prepare
+
+def bench_batch_activate(hidden, size=1000): # BatchNetwork.activate() of size networks with hidden extra nodes each
+    def prepare(seed):
+        config = load_config()
+        nets = flappBird.BatchNetwork.create([g for _, g in make_genomes(config, size, hidden, seed)], config)
+        inputs = np.random.RandomState(seed).uniform(0, 700, (size, 3))
+        rows = np.arange(size)
+        def workload():
+            nets.activate(inputs, rows)
+        return workload, size
+    return prepare
+
+def bench_champion_activate(hidden, size=100): # Champion.activate() of size exported networks with hidden extra nodes each
+    def prepare(seed):
+        config = load_config()
+        nets = []
+        with tempfile.TemporaryDirectory() as folder: # removed even if an export fails
+            path = os.path.join(folder, "champion.bin")
+            for _, g in make_genomes(config, size, hidden, seed):
+                flappBird.export_champion(g, config, path)
+                nets.append(champion.load(path))
+        inputs = np.random.RandomState(seed).uniform(0, 700, (size, 3)).tolist()
+        def workload():
+            for net, x in zip(nets, inputs):
+                net.activate(x)
+        return workload, size
+    return prepare
+
+def bench_generation(size, max_frames=2000): # a whole headless generation of size random genomes (ops: frames simulated)
+    def prepare(seed):
+        config = load_config()
+        genomes = make_genomes(config, size, 0, seed)
+        times = flappBird.PhaseTimes()
+        # some random genomes never die, so the generation is cut off after max_frames
+        flappBird.simulate(genomes, config, seed, times=times, max_frames=max_frames) # only to count the frames
+        def workload():
+            flappBird.simulate(genomes, config, seed, max_frames=max_frames)
+        return workload, times.frames
+    return prepare
+
+def bench_courses(size, courses, max_frames=2000): # a whole headless generation of size random genomes on several courses at once (ops: frames simulated)
+    def prepare(seed):
+        config = load_config()
+        genomes = make_genomes(config, size, 0, seed)
+        seeds = list(range(seed, seed + courses))
+        times = flappBird.PhaseTimes()
+        flappBird.simulate_courses(genomes, config, seeds, times=times, max_frames=max_frames) # only to count the frames
+        def workload():
+            flappBird.simulate_courses(genomes, config, seeds, max_frames=max_frames)
+        return workload, times.frames
+    return prepare
+
+def bench_draw_window(size): # draw_window() with size birds, drawn into an offscreen surface
+    def prepare(seed):
+        pygame.display.set_mode((1, 1)) # draw_window() updates the display, so there has to be one (a dummy one here)
+        win = pygame.Surface((flappBird.WIN_WIDTH, flappBird.WIN_HEIGHT))
+        rng = random.Random(seed)
+        birds = flappBird.Flock(size, 230, 350)
+        birds.y = np.random.RandomState(seed).uniform(0, 700, size)
+        birds.tilt = np.random.RandomState(seed).choice([25, 5, -15, -35, -55, -75, -90], size)
+        pipes = [flappBird.Pipe(300, rng), flappBird.Pipe(600, rng)]
+        base = flappBird.Base(730)
+        def workload():
+            flappBird.draw_window(win, birds, pipes, base, 10, 1)
+        return workload, 1
+    return prepare
+
+BENCHMARKS = {}
+for n in (1, 100, 1000, 10000):
+    BENCHMARKS["bird_move_%d" % n] = bench_bird_move(n)
+    BENCHMARKS["flock_move_%d" % n] = bench_flock_move(n)
+BENCHMARKS["pipe_collide_1000"] = bench_pipe_collide(1000)
+BENCHMARKS["collide_flock_10000"] = bench_collide_flock(10000)
+for hidden in (0, 5, 20):
+    BENCHMARKS["activate_hidden_%d" % hidden] = bench_activate(hidden)
+    BENCHMARKS["batch_activate_hidden_%d" % hidden] = bench_batch_activate(hidden)
+    BENCHMARKS["champion_activate_hidden_%d" % hidden] = bench_champion_activate(hidden)
+BENCHMARKS["generation_200"] = bench_generation(200)
+BENCHMARKS["courses_200x4"] = bench_courses(200, 4)
+for n in (1, 100):
+    BENCHMARKS["draw_window_%d" % n] = bench_draw_window(n)
+
+def measure(prepare, repeat, seed):
+    workload, ops = prepare(seed)
+    workload() # warm up (caches, lazy imports...)
+
+    # workloads that take less than 10ms are run several times in a row, so the timer resolution does not matter
+    start = time.perf_counter()
+    workload()
+    number = max(1, int(0.01 / max(time.perf_counter() - start, 1e-9)))
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            workload()
+        times.append((time.perf_counter() - start) / number)
+    times.sort()
+    median = times[len(times) // 2]
+    return {"median": median, "p95": times[min(len(times) - 1, int(0.95 * len(times)))],
+            "ops": ops, "ops_per_sec": ops / median, "repeat": repeat}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the Flappy Bird simulation, collisions, networks and drawing.")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all of them)")
+    parser.add_argument("--repeat", type=int, default=15, help="timed runs of every benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the workloads")
+    parser.add_argument("--output", metavar="FILE", help="write the results to FILE as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="compare the results with a previous --output FILE")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="slow down (0.1 = 10%%) that counts as a regression")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmarks: " + ", ".join(unknown))
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    regressions = []
+    print("{0:<28} {1:>12} {2:>12} {3:>14} {4:>10}".format("benchmark", "median (s)", "p95 (s)", "ops/sec", "vs base"))
+    for name in args.names or BENCHMARKS:
+        result = results[name] = measure(BENCHMARKS[name], args.repeat, args.seed)
+        change = ""
+        if name in baseline:
+            ratio = result["median"] / baseline[name]["median"] # > 1 means slower than the baseline
+            change = "{0:+.1f}%".format(100 * (ratio - 1))
+            if ratio > 1 + args.tolerance:
+                regressions.append(name)
+                change += " !"
+        print("{0:<28} {1:>12.6f} {2:>12.6f} {3:>14.1f} {4:>10}".format(name, result["median"], result["p95"],
+                                                                         result["ops_per_sec"], change))
+
+    if args.output:
+        machine = {"python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor(),
+                   "numpy": np.__version__, "pygame": pygame.version.ver}
+        with open(args.output, "w") as f:
+            json.dump({"machine": machine, "seed": args.seed, "results": results}, f, indent=1)
+
+    if regressions:
+        print("slower than the baseline: " + ", ".join(regressions))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+# a trained bird as a standalone controller: loads an exported champion network and evaluates it, without neat or numpy
+import argparse
+import math
+import struct
+from functools import reduce
+from operator import mul
+
+'''
+FILE FORMAT (written by flappBird.export_champion(), all numbers little-endian):
+- header: magic b"FBCH", version (uint16), number of inputs (uint16), outputs (uint16), nodes (uint32) and links (uint32).
+- outputs: for every output, the position of its value (int32, -1 if the output is not connected to anything).
+- nodes, in topological order (every node only reads values that were computed before it):
+  activation (uint8, index into ACTIVATIONS), aggregation (uint8, index into AGGREGATIONS), bias and response (float64),
+  number of links (uint32).
+- links, node after node: position of the value that is read (uint32) and its weight (float64).
+
+The values of a network are numbered [inputs | node 0 | node 1 | ...], so the position of node n is number of inputs + n.
+Every node computes activation(bias + response * aggregation([value * weight for every link])), with the same functions as
+neat-python, in the same order, so a champion gives exactly the outputs of neat's FeedForwardNetwork.activate().
+
+When a champion is loaded, it is compiled into one python function with one line per node and the weights written into it
+as constants (see Champion.compile()), so a decision runs no loops and looks nothing up: a few microseconds for small networks.
+'''
+
+MAGIC = b"FBCH"
+VERSION = 1
+HEADER = struct.Struct("<4sHHHII")
+
+def clamp(z, low, high):
+    return max(low, min(high, z))
+
+def literal(x): # python code for a float, that gives back exactly the same float
+    return repr(x) if math.isfinite(x) else "float('{0!r}')".format(x)
+
+def inv_activation(z):
+    try:
+        return 1.0 / z
+    except ArithmeticError: # handle overflows
+        return 0.0
+
+def mean_aggregation(x):
+    return sum(map(float, x)) / len(x)
+
+def median_aggregation(x):
+    if len(x) <= 2:
+        return mean_aggregation(x)
+    x = sorted(x)
+    i = len(x) // 2
+    return x[i] if len(x) % 2 == 1 else (x[i - 1] + x[i]) / 2.0
+
+# the built-in functions of neat-python (neat.activations and neat.aggregations). the index in these lists is saved in the
+# file, so new functions may only be added at the end
+ACTIVATIONS = [
+    ("sigmoid", lambda z: 1.0 / (1.0 + math.exp(-clamp(5.0 * z, -60.0, 60.0)))),
+    ("tanh", lambda z: math.tanh(clamp(2.5 * z, -60.0, 60.0))),
+    ("sin", lambda z: math.sin(clamp(5.0 * z, -60.0, 60.0))),
+    ("gauss", lambda z: math.exp(-5.0 * clamp(z, -3.4, 3.4)**2)),
+    ("relu", lambda z: z if z > 0.0 else 0.0),
+    ("softplus", lambda z: 0.2 * math.log(1 + math.exp(clamp(5.0 * z, -60.0, 60.0)))),
+    ("identity", lambda z: z),
+    ("clamped", lambda z: clamp(z, -1.0, 1.0)),
+    ("inv", inv_activation),
+    ("log", lambda z: math.log(max(1e-7, z))),
+    ("exp", lambda z: math.exp(clamp(z, -60.0, 60.0))),
+    ("abs", abs),
+    ("hat", lambda z: max(0.0, 1 - abs(z))),
+    ("square", lambda z: z ** 2),
+    ("cube", lambda z: z ** 3),
+]
+AGGREGATIONS = [
+    ("product", lambda x: reduce(mul, x, 1.0)),
+    ("sum", sum),
+    ("max", max),
+    ("min", min),
+    ("maxabs", lambda x: max(x, key=abs)),
+    ("median", median_aggregation),
+    ("mean", mean_aggregation),
+]
+ACTIVATION_INDEX = dict((name, i) for i, (name, _) in enumerate(ACTIVATIONS))
+AGGREGATION_INDEX = dict((name, i) for i, (name, _) in enumerate(AGGREGATIONS))
+
+# Champion - a compiled feed-forward network
+class Champion:
+    def __init__(self, num_inputs, outputs, nodes):
+        '''
+        outputs: position of the value of every output (-1: not connected).
+        nodes: (activation name, aggregation name, bias, response, [(position, weight), ...]) of every node, in topological order.
+        '''
+        for activation, aggregation, _, _, _ in nodes:
+            if activation not in ACTIVATION_INDEX:
+                raise ValueError("unsupported activation function {0!r}".format(activation))
+            if aggregation not in AGGREGATION_INDEX:
+                raise ValueError("unsupported aggregation function {0!r}".format(aggregation))
+        self.num_inputs = num_inputs
+        self.outputs = list(outputs)
+        self.nodes = [(a, g, bias, response, [tuple(link) for link in links]) for a, g, bias, response, links in nodes]
+
+        self.run = self.compile()
+
+    def compile(self):
+        '''
+        Writes the network as a python function of its inputs, eg. for a network with 3 inputs and one hidden node:
+            def run(v0, v1, v2):
+                v3 = act_relu(0.5 + 1.0 * agg_sum((v0 * -1.25, v2 * 0.75, )))
+                v4 = act_tanh(-0.1 + 1.0 * agg_sum((v3 * 2.0, )))
+                return [v4]
+        '''
+        lines = ["def run({0}):".format(", ".join("v{0}".format(i) for i in range(self.num_inputs)))]
+        for n, (activation, aggregation, bias, response, links) in enumerate(self.nodes):
+            terms = "".join("v{0} * {1}, ".format(i, literal(w)) for i, w in links)
+            lines.append("    v{0} = act_{1}({2} + {3} * agg_{4}(({5})))".format(self.num_inputs + n, activation, literal(bias),
+                                                                           literal(response), aggregation, terms))
+        lines.append("    return [{0}]".format(", ".join("v{0}".format(p) if p >= 0 else "0.0" for p in self.outputs)))
+
+        namespace = dict(("act_" + name, func) for name, func in ACTIVATIONS)
+        namespace.update(("agg_" + name, func) for name, func in AGGREGATIONS)
+        exec("\n".join(lines), namespace)
+        return namespace["run"]
+
+    def activate(self, inputs): # list of the outputs for a list of inputs
+        if len(inputs) != self.num_inputs:
+            raise RuntimeError("Expected {0:n} inputs, got {1:n}".format(self.num_inputs, len(inputs)))
+        return self.run(*inputs)
+
+    def save(self, filename):
+        links = [link for node in self.nodes for link in node[4]]
+        with open(filename, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.num_inputs, len(self.outputs), len(self.nodes), len(links)))
+            f.write(struct.pack("<%di" % len(self.outputs), *self.outputs))
+            for activation, aggregation, bias, response, node_links in self.nodes:
+                f.write(struct.pack("<BBddI", ACTIVATION_INDEX[activation], AGGREGATION_INDEX[aggregation], bias, response,
+                                    len(node_links)))
+            for position, weight in links:
+                f.write(struct.pack("<Id", position, weight))
+
+def load(filename): # reads a Champion from a file written by Champion.save()
+    with open(filename, "rb") as f:
+        data = f.read()
+    magic, version, num_inputs, num_outputs, num_nodes, num_links = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("{0} is not a champion file of version {1}".format(filename, VERSION))
+    offset = HEADER.size
+    outputs = struct.unpack_from("<%di" % num_outputs, data, offset)
+    offset += 4 * num_outputs
+    node_format = struct.Struct("<BBddI")
+    heads = []
+    for _ in range(num_nodes):
+        heads.append(node_format.unpack_from(data, offset))
+        offset += node_format.size
+    link_format = struct.Struct("<Id")
+    nodes = []
+    for activation, aggregation, bias, response, count in heads:
+        links = [link_format.unpack_from(data, offset + i * link_format.size) for i in range(count)]
+        offset += count * link_format.size
+        nodes.append((ACTIVATIONS[activation][0], AGGREGATIONS[aggregation][0], bias, response, links))
+    return Champion(num_inputs, outputs, nodes)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate an exported Flappy Bird champion for one set of inputs.")
+    parser.add_argument("champion", help="champion file (see flappBird.py --champion)")
+    parser.add_argument("inputs", type=float, nargs="+",
+                        help="inputs of the network (for the game: bird y, distance to the top pipe, distance to the bottom pipe)")
+    args = parser.parse_args()
+
+    print(" ".join(repr(x) for x in load(args.champion).activate(args.inputs)))
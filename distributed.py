@@ -0,0 +1,195 @@
+# distributed evaluation of the genomes over TCP, so one training run can use the cores of several machines
+import argparse
+import pickle
+import queue
+import socket
+import struct
+import threading
+import time
+
+'''
+PROTOCOL:
+- the Coordinator runs inside the training process (see run() in flappBird.py) and listens on a TCP port.
+- every worker process (python distributed.py --host HOST --port PORT) connects to it and then waits for tasks.
+- a task is a chunk of the generation: ("task", task_id, genomes, config, seeds, timed, aggregate, max_frames). The worker
+  simulates the chunk headless on the pipe courses in seeds with flappBird.evaluate_chunk() and answers with
+  ("result", task_id, fitnesses, times), where times are the phase timings of the chunk if timed is True (otherwise None).
+  ("stop",) tells the worker to exit.
+- every message is a pickled tuple, prefixed with its length as a 4 byte unsigned integer.
+
+If a worker disconnects (eg. its machine died) or does not answer a task within task_timeout seconds, the connection is
+dropped and the task is handed to another worker. A worker that loses its connection (eg. because it was too slow)
+connects again and waits for new tasks. A task that failed max_attempts times, or a generation without any worker
+connected for task_timeout seconds, stops the training with a RuntimeError instead of waiting forever. Every worker runs the same simulate() (or simulate_courses()) as main()
+on the same seeded pipe courses, so the fitness values are identical to a single-process run.
+
+Messages are pickled, so only run the coordinator and the workers on a network you trust.
+'''
+
+HEADER = struct.Struct("!I") # length of the pickled message that follows
+
+def send_message(sock, message):
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+def recv_exactly(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk: # the other side closed the connection
+            raise EOFError("connection closed")
+        data += chunk
+    return data
+
+def recv_message(sock):
+    size, = HEADER.unpack(recv_exactly(sock, HEADER.size))
+    return pickle.loads(recv_exactly(sock, size))
+
+# Coordinator - hands the chunks of every generation to the connected workers and collects their fitness values
+class Coordinator:
+    def __init__(self, host="localhost", port=5757, chunk_size=None, task_timeout=300, max_attempts=3):
+        self.chunk_size = chunk_size # number of genomes in every task (None: one task per connected worker)
+        self.task_timeout = task_timeout # seconds a worker gets to answer a task before it is handed to another worker
+        self.max_attempts = max_attempts # workers a task is sent to before we give up on it
+        self.tasks = queue.Queue() # tasks waiting for a worker
+        self.results = queue.Queue() # (task_id, fitnesses, times) sent back by the workers, (task_id, None, None) for a failed task
+        self.failures = {} # number of times every task failed
+        self.next_task_id = 0
+        self.workers = 0 # number of connected workers
+        self.lock = threading.Lock()
+
+        self.server = socket.create_server((host, port))
+        self.address = self.server.getsockname()[:2] # useful with port=0, where the operating system picks a free port
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self): # waits for workers to connect, every worker is served by its own thread
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError: # the server socket was closed by close()
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.lock:
+                self.workers += 1
+            threading.Thread(target=self.serve, args=(conn,), daemon=True).start()
+
+    def serve(self, conn): # sends tasks to one worker, one at a time, until the worker fails or we are closed
+        conn.settimeout(self.task_timeout)
+        while True:
+            task = self.tasks.get()
+            if task is None: # close() was called
+                try:
+                    send_message(conn, ("stop",))
+                except OSError:
+                    pass
+                break
+
+            try:
+                send_message(conn, ("task",) + task)
+                reply = recv_message(conn)
+            except (OSError, EOFError, pickle.UnpicklingError): # the worker died, disconnected or timed out
+                with self.lock:
+                    failures = self.failures[task[0]] = self.failures.get(task[0], 0) + 1
+                if failures < self.max_attempts:
+                    self.tasks.put(task) # someone else has to do it
+                else:
+                    self.results.put((task[0], None, None)) # evaluate() gives up
+                break
+            self.results.put(reply[1:])
+
+        conn.close()
+        with self.lock:
+            self.workers -= 1
+
+    def connected(self): # number of connected workers, after waiting up to task_timeout seconds for the first one
+        deadline = time.monotonic() + self.task_timeout
+        while True:
+            with self.lock:
+                workers = self.workers
+            if workers > 0:
+                return workers
+            if time.monotonic() > deadline:
+                raise RuntimeError("no worker connected for {0} seconds".format(self.task_timeout))
+            time.sleep(0.1)
+
+    def evaluate(self, genomes, config, seeds, times=None, aggregate="mean", max_frames=None): # the timings of all the workers are added to times (a PhaseTimes)
+        workers = self.connected()
+        size = self.chunk_size
+        if size is None: # split the generation evenly over the workers, like ParallelEvaluator
+            size = -(-len(genomes) // workers) # genomes per chunk, rounded up
+        chunks = {}
+        for i in range(0, len(genomes), size):
+            chunks[self.next_task_id] = genomes[i:i + size]
+            self.tasks.put((self.next_task_id, chunks[self.next_task_id], config, seeds, times is not None, aggregate, max_frames))
+            self.next_task_id += 1
+
+        # wait for all the chunks of this generation (answers to tasks we are not waiting for are ignored)
+        while chunks:
+            try:
+                task_id, fitnesses, chunk_times = self.results.get(timeout=1)
+            except queue.Empty: # still waiting, as long as some worker can do the tasks
+                self.connected()
+                continue
+            if fitnesses is None and task_id in chunks:
+                raise RuntimeError("task {0} failed on {1} workers (see task_timeout)".format(task_id, self.max_attempts))
+            chunk = chunks.pop(task_id, None)
+            if chunk is not None:
+                for (_, g), fitness in zip(chunk, fitnesses):
+                    g.fitness = fitness
+                if times is not None:
+                    times.add(chunk_times)
+
+    def close(self): # tells every connected worker to exit
+        self.server.close()
+        with self.lock:
+            workers = self.workers
+        for _ in range(workers):
+            self.tasks.put(None)
+
+def connect(host, port, patience=None): # connects to the coordinator, trying once every second for patience seconds (None: forever)
+    deadline = None if patience is None else time.monotonic() + patience
+    while True:
+        try:
+            sock = socket.create_connection((host, port))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return sock
+        except OSError:
+            if deadline is not None and time.monotonic() > deadline:
+                raise
+            time.sleep(1) # the coordinator is not up yet (or not anymore)
+
+def worker(host, port, retry=True, reconnect=60): # connects to a Coordinator and evaluates tasks until it is told to stop
+    '''
+    retry: wait for the coordinator to come up (otherwise fail if it is not listening yet).
+    reconnect: seconds to keep trying to connect again after the connection was lost (eg. the coordinator dropped us after
+    a task took longer than its task_timeout). If the coordinator is gone for good, the worker exits after that.
+    '''
+    import flappBird # only the workers need the game (the coordinator never simulates anything itself)
+
+    sock = connect(host, port, None if retry else 0)
+    while True:
+        with sock:
+            try:
+                while True:
+                    message = recv_message(sock)
+                    if message[0] == "stop":
+                        return
+                    _, task_id, genomes, config, seeds, timed, aggregate, max_frames = message
+                    result = flappBird.evaluate_chunk(genomes, config, seeds, timed, aggregate, max_frames)
+                    send_message(sock, ("result", task_id) + result)
+            except (OSError, EOFError): # lost the connection, the coordinator may still want us
+                pass
+        try:
+            sock = connect(host, port, reconnect)
+        except OSError: # the coordinator went away
+            return
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker process that evaluates Flappy Bird genomes for a training run.")
+    parser.add_argument("--host", default="localhost", help="host of the training run (the coordinator)")
+    parser.add_argument("--port", type=int, default=5757, help="port of the coordinator")
+    parser.add_argument("--reconnect", type=float, default=60, metavar="SECONDS", 
+                        help="how long to keep trying to connect again after losing the connection")
+    args = parser.parse_args()
+
+    worker(args.host, args.port, reconnect=args.reconnect)
@@ -4,7 +4,17 @@ import neat
 import time
 import os
 import random # to be used to randomly set the height of the pipes
-pygame.font.init()
+import argparse # command line options for run()
+import numpy as np # used to move the whole population of birds at once
+import multiprocessing # to evaluate a generation on all the cores of the machine
+import csv # for the timing reports of PhaseTimingReporter
+import json
+import functools # lru_cache for the rotated bird images and the score texts
+import pickle # for the checkpoints and the winner
+import gzip
+import types
+import champion # the exported winner (see export_champion() and play())
+import recording # recordings of whole generations (see replay())
 
 # set the dimensions for the window
 # we use capital letters for constant variables as a standard convention
@@ -14,23 +24,168 @@ WIN_HEIGHT = 800
 # initializing the generation count 
 GEN = 0
 
-# load all images
-# pygame.transform.scale2x(): scales the image to be twice of its original size
-# pygame.image.load(): loads the image
-BIRD_IMGS = [pygame.transform.scale2x(pygame.image.load(os.path.join("imgs", "bird1.png"))), 
-             pygame.transform.scale2x(pygame.image.load(os.path.join("imgs", "bird2.png"))), 
-             pygame.transform.scale2x(pygame.image.load(os.path.join("imgs", "bird3.png")))]
-PIPE_IMG = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs", "pipe.png")))
-BASE_IMG = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs", "base.png")))
-BG_IMG = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs", "bg.png")))
+# when True, main() runs the exact same simulation without opening a window, drawing anything or limiting the frame rate
+# (used for training on machines without a display, eg. CI or cluster boxes). set through run(config_path, headless=True)
+HEADLESS = False
 
-STAT_FONT = pygame.font.SysFont("comicsans", 40) # defining the font style and size for the score
+# spectator controls for a windowed run (see run()), so that watching the training does not slow it down much:
+RENDER_EVERY = 1 # only every Nth generation is drawn, the other generations run headless at full speed
+RENDER_TOP_K = None # only draw the K birds closest to the centre of the next gap (None: draw all of them)
+RENDER_FRAME_SKIP = 1 # only draw one of every M frames of the game
+
+# speed of a windowed run (see StepClock): 1 is real time, N is N times faster and None is unlocked (as fast as possible).
+# it can be changed with the keyboard while the game runs, and the new speed is kept for the next generations
+SPEED = 1
+POLL_EVERY = 1 # only look at the window events (keys, closing the window) every K steps of the game
+IDLE_POLL_EVERY = 200 # the generations a windowed run does not draw (see RENDER_EVERY) look at the events every 200 frames
+
+# when set (by PhaseTimingReporter), simulate() adds the time spent in every phase of the game loop to this PhaseTimes
+TIMINGS = None
+
+# when set (see run()), every generation that main() plays in this process is recorded to RECORD_DIR/gen-<GEN>.fbr
+RECORD_DIR = None
+
+# robust fitness (see simulate_courses()): every genome plays COURSES pipe courses and its fitness is the AGGREGATE ("mean" or
+# "min") of its fitness on each of them. MAX_FRAMES cuts every game off after that many frames (None: play until all birds die)
+COURSES = 1
+AGGREGATE = "mean"
+MAX_FRAMES = None
+
+# when set (see run()), main() hands every generation to this ParallelEvaluator (or distributed.Coordinator) instead of
+# simulating it in this process
+EVALUATOR = None
+
+LOCAL_DIR = os.path.dirname(os.path.abspath(__file__)) # the images are found relative to this file, not the current directory
+
+# ASSETS CLASS - loads the images, their collision masks and the font the first time they are needed
+class Assets:
+    '''
+    Decoding the png files, scaling them up and building their collision masks takes a while, and a headless run (or a worker
+    process) never draws anything, so nothing is loaded when flappBird is imported:
+    - image() gives the scaled image (a pygame Surface), the first time something is drawn.
+    - mask() and size() give the collision mask and the size of an image. The game needs them to check collisions, so headless
+      runs use them too, but they never need the images themselves.
+    - font() loads the font the first time a text is drawn.
+    The scaled images (their pixels) and their masks (packed bits) are kept in a compressed cache file, so after the first run no
+    png file is decoded at all, and a headless run only reads the few kB of masks and sizes. The cache is rebuilt whenever a
+    png file changes. If it cannot be written (eg. read-only folder), everything is simply loaded from the png files.
+    '''
+    VERSION = 1 # change this whenever the format of the cache file changes
+    NAMES = ("bird1", "bird2", "bird3", "pipe", "base", "bg") # imgs/<name>.png
+
+    def __init__(self, folder, cache_file):
+        self.folder = folder
+        self.cache_file = cache_file
+        self.arrays = None # arrays read from (or written to) the cache file so far
+        self.images = {}
+        self.masks = {}
+        self.loaded_font = None
+
+    def signature(self): # changes whenever one of the png files changes
+        signature = [self.VERSION]
+        for name in self.NAMES:
+            stat = os.stat(os.path.join(self.folder, name + ".png"))
+            signature += [stat.st_mtime_ns, stat.st_size]
+        return signature
+
+    def build(self): # decodes and scales all the images, builds their masks and writes the cache file
+        arrays = {"signature": np.array(self.signature(), dtype=np.int64)}
+        for name in self.NAMES:
+            # pygame.transform.scale2x(): scales the image to be twice of its original size
+            # pygame.image.load(): loads the image
+            img = pygame.transform.scale2x(pygame.image.load(os.path.join(self.folder, name + ".png")))
+            w, h = img.get_size()
+            arrays[name + "_size"] = np.array([w, h])
+            # the pixels are kept in the format of the png file, because blitting 8 bit images is much faster than RGBA ones
+            if img.get_bitsize() == 8: # palette image, most of them mark their transparent pixels with a colorkey
+                arrays[name + "_pixels"] = np.frombuffer(pygame.image.tostring(img, "P"), dtype=np.uint8).reshape(h, w)
+                arrays[name + "_palette"] = np.array(img.get_palette(), dtype=np.uint8)[:, :3]
+                colorkey = img.get_colorkey()
+                arrays[name + "_colorkey"] = np.array(colorkey if colorkey is not None else [], dtype=np.uint8)
+            else:
+                arrays[name + "_pixels"] = np.frombuffer(pygame.image.tostring(img, "RGBA"), dtype=np.uint8).reshape(h, w, 4)
+            mask = pygame.mask.from_surface(img).to_surface() # white where the mask is set, black everywhere else
+            arrays[name + "_mask"] = np.packbits(np.frombuffer(pygame.image.tostring(mask, "RGB"), dtype=np.uint8)[::3] > 0)
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp = "{0}.{1}.tmp".format(self.cache_file, os.getpid())
+            with open(tmp, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp, self.cache_file) # other processes never see a half written cache file
+        except OSError:
+            pass
+        return arrays
+
+    def array(self, key): # one array of the cache file (every process opens the file itself, so forked workers never share it)
+        if self.arrays is None:
+            try:
+                with np.load(self.cache_file) as cache:
+                    self.arrays = {} if cache["signature"].tolist() == self.signature() else self.build()
+            except (OSError, ValueError, KeyError): # no cache file yet, or a broken one
+                self.arrays = self.build()
+        if key not in self.arrays:
+            with np.load(self.cache_file) as cache:
+                self.arrays[key] = cache[key]
+        return self.arrays[key]
+
+    def size(self, name): # (width, height) of the scaled image
+        return tuple(self.array(name + "_size").tolist())
+
+    def image(self, name):
+        if name not in self.images:
+            pixels = self.array(name + "_pixels")
+            if pixels.ndim == 2: # palette image
+                img = pygame.image.fromstring(pixels.tobytes(), self.size(name), "P")
+                img.set_palette([tuple(color) for color in self.array(name + "_palette").tolist()])
+                colorkey = self.array(name + "_colorkey")
+                if len(colorkey) > 0:
+                    img.set_colorkey(tuple(colorkey.tolist()))
+            else:
+                img = pygame.image.fromstring(pixels.tobytes(), self.size(name), "RGBA")
+            self.images[name] = img
+        return self.images[name]
+
+    def mask(self, name, flipped=False): # collision mask of the image (flipped: of the image turned upside down)
+        if (name, flipped) not in self.masks:
+            w, h = self.size(name)
+            bits = np.unpackbits(self.array(name + "_mask"), count=w*h).reshape(h, w)
+            if flipped:
+                bits = bits[::-1]
+            pixels = np.zeros((h, w, 4), dtype=np.uint8)
+            pixels[:, :, 3] = bits * 255 # opaque where the mask is set
+            self.masks[name, flipped] = pygame.mask.from_surface(pygame.image.fromstring(pixels.tobytes(), (w, h), "RGBA"))
+        return self.masks[name, flipped]
+
+    def font(self):
+        if self.loaded_font is None:
+            pygame.font.init()
+            self.loaded_font = pygame.font.SysFont("comicsans", 40) # defining the font style and size for the score
+        return self.loaded_font
+
+ASSETS = Assets(os.path.join(LOCAL_DIR, "imgs"), os.path.join(LOCAL_DIR, "imgs", "__pycache__", "assets.npz"))
+BIRD_NAMES = ("bird1", "bird2", "bird3") # the animation frames of the bird
+
+# LazyAsset - a class variable that is only loaded (from ASSETS) the first time it is used
+class LazyAsset:
+    def __init__(self, load):
+        self.load = load # function without arguments that loads the value
+
+    def __set_name__(self, owner, name):
+        self.owner = owner
+        self.name = name
+
+    def __get__(self, obj, cls=None):
+        value = self.load()
+        setattr(self.owner, self.name, value) # from now on it is a plain class variable
+        return value
 
 
 # BIRD CLASS - represents the bird objects moving in the game window
 class Bird:
     # class variables (going to be constant)
-    IMGS = BIRD_IMGS
+    IMGS = LazyAsset(lambda: [ASSETS.image(name) for name in BIRD_NAMES])
+    # collision masks never change for an image, so they are built once for every bird animation frame and reused (see Pipe.collide())
+    MASKS = LazyAsset(lambda: dict((ASSETS.image(name), ASSETS.mask(name)) for name in BIRD_NAMES))
     MAX_ROTATION = 25 # represents the degree by which the bird will rotate when going up or down
     ROT_VEL = 20 # represents how much we are going to rotate on each frame every time we move the bird
     ANIMATION_TIME = 5 # represents how long we are going to show each bird animation which creates a flapping effect
@@ -86,7 +241,7 @@ class Bird:
             if self.tilt > -90:
                 self.tilt -= self.ROT_VEL
 
-    def draw(self, win): # win represents the window we are drawing our game into
+    def animate(self): # advances the flapping animation by one frame without drawing anything
         self.img_count += 1
         '''
         to animate our bird, we need to keep track of how many ticks we have shown at current image for
@@ -111,34 +266,278 @@ class Bird:
             self.img = self.IMGS[1]
             self.img_count = self.ANIMATION_TIME*2 # this will set the img_count to our 2nd case above when we jump upwards
 
-        # rotate image about its center
-        rotated_img = pygame.transform.rotate(self.img, self.tilt) # image, angle
-        new_rect = rotated_img.get_rect(center=self.img.get_rect(topleft=(self.x, self.y)).center)
-        win.blit(rotated_img, new_rect .topleft)
+    def draw(self, win): # win represents the window we are drawing our game into
+        self.animate()
+
+        blit_rotate_center(win, self.img, (self.x, self.y), self.tilt)
     
     def get_mask(self): # used for collision with objects
-        return pygame.mask.from_surface(self.img) # creates mask for the bird (2D list of pixels)
+        return self.MASKS[self.img] # mask for the bird (2D list of pixels), built once per animation frame
+
+# the birds only ever use a handful of tilts, so every (animation frame, tilt) pair is rotated once and then reused
+# (the least recently used images are dropped if some code uses lots of different angles)
+@functools.lru_cache(maxsize=128)
+def rotate_image(img, angle):
+    return pygame.transform.rotate(img, angle) # image, angle
+
+def blit_rotate_center(win, img, topleft, angle): # draws a bird image rotated about its center
+    rotated_img = rotate_image(img, angle)
+    new_rect = rotated_img.get_rect(center=img.get_rect(topleft=topleft).center)
+    win.blit(rotated_img, new_rect .topleft)
+
+# FLOCK CLASS - moves a whole population of birds at once
+class Flock:
+    '''
+    Calling Bird.move() for every single bird on every frame means the python interpreter does the same handful of
+    multiplications one bird at a time. With thousands of birds that overhead is the main cost of a generation.
+
+    A Flock keeps the state of every bird (y, vel, tick_count, height, tilt and the animation counter) in NumPy arrays,
+    one entry per bird, and moves all of them together with array operations. The formulas are exactly the ones in
+    Bird.move(), Bird.jump() and Bird.animate(), so every bird ends up at the same position as a Bird object would.
+    All birds start at the same x-position and never move along the x-axis, so x is a single number.
+
+    Dead birds are not removed one by one (that would copy all the arrays on every death). kill() only clears their entry
+    in the alive mask, and once half of the entries are dead, compact() drops all the dead ones at once. Dead birds keep
+    moving until then (it costs less than skipping them), but they are never collided, drawn or fed to a network.
+    '''
+    FIELDS = ("y", "tilt", "tick_count", "vel", "height", "img_count", "img_index", "ids", "alive") # one array per field
+    IMGS = LazyAsset(lambda: [ASSETS.image(name) for name in BIRD_NAMES]) # only needed for drawing
+    MASKS = LazyAsset(lambda: [ASSETS.mask(name) for name in BIRD_NAMES]) # the same masks as Bird.MASKS, by image index
+    SIZES = LazyAsset(lambda: np.array([ASSETS.size(name) for name in BIRD_NAMES])) # (width, height) of every image
+    MAX_ROTATION = Bird.MAX_ROTATION
+    ROT_VEL = Bird.ROT_VEL
+    ANIMATION_TIME = Bird.ANIMATION_TIME
+
+    def __init__(self, size, x, y): # size birds, all starting at (x, y)
+        self.x = x
+        self.y = np.full(size, y, dtype=np.float64)
+        self.tilt = np.zeros(size, dtype=np.int64)
+        self.tick_count = np.zeros(size, dtype=np.int64)
+        self.vel = np.zeros(size, dtype=np.float64)
+        self.height = self.y.copy()
+        self.img_count = np.zeros(size, dtype=np.int64)
+        self.img_index = np.zeros(size, dtype=np.int64) # index into IMGS of the image each bird currently shows
+        self.ids = np.arange(size) # position of each bird in the population it was created for (its genome)
+        self.alive = np.ones(size, dtype=bool)
+        self.count = size # number of birds alive
+        self.img_heights = self.SIZES[:, 1] # used for the ground check
+        self.img_widths = self.SIZES[:, 0] # used for the collision broad phase
+
+    def __len__(self): # number of birds still alive
+        return self.count
+
+    def jump(self, jumping): # jumping is a boolean array, True for every bird that should jump
+        self.vel[jumping] = -10.5
+        self.tick_count[jumping] = 0
+        self.height[jumping] = self.y[jumping]
+
+    def move(self): # same physics as Bird.move(), for all birds at once
+        self.tick_count += 1
+
+        d = self.vel*self.tick_count + 1.5*self.tick_count**2
+
+        # terminal velocity
+        d = np.minimum(d, 16)
+        d[d < 0] -= 2
+
+        self.y += d
+
+        # tilting
+        up = (d < 0) | (self.y < self.height + 50)
+        self.tilt[up & (self.tilt < self.MAX_ROTATION)] = self.MAX_ROTATION
+        self.tilt[~up & (self.tilt > -90)] -= self.ROT_VEL
+
+    def animate(self): # same flapping animation as Bird.animate(), for all birds at once
+        self.img_count += 1
+        c = self.img_count
+
+        # an img_count of exactly ANIMATION_TIME*4 keeps whatever image was shown before, just like in Bird.animate()
+        self.img_index[c < self.ANIMATION_TIME*4] = 1
+        self.img_index[c < self.ANIMATION_TIME*3] = 2
+        self.img_index[c < self.ANIMATION_TIME*2] = 1
+        self.img_index[c < self.ANIMATION_TIME] = 0
+        restart = c == self.ANIMATION_TIME*4 + 1
+        self.img_index[restart] = 0
+        self.img_count[restart] = 0
+
+        # falling birds do not flap
+        falling = self.tilt <= -80
+        self.img_index[falling] = 1
+        self.img_count[falling] = self.ANIMATION_TIME*2
+
+    def draw(self, win, shown=None, animate=True): # animates every bird, but only draws the birds at the positions in shown (default: all alive birds)
+        if animate: # (a replay sets the images of the birds itself)
+            self.animate()
+        if shown is None:
+            shown = self.alive
+        for y, tilt, i in zip(self.y[shown].tolist(), self.tilt[shown].tolist(), self.img_index[shown].tolist()):
+            blit_rotate_center(win, self.IMGS[i], (self.x, y), tilt)
+
+    def get_mask(self, x): # collision mask of the bird at position x in the flock
+        return self.MASKS[self.img_index[x]]
+
+    def get_heights(self): # height of the image every bird is currently showing
+        return self.img_heights[self.img_index]
+
+    def get_widths(self): # width of the image every bird is currently showing
+        return self.img_widths[self.img_index]
+
+    def kill(self, dead): # dead: positions (or a boolean mask) of birds that just died
+        self.alive[dead] = False
+        self.count = int(np.count_nonzero(self.alive))
+        if self.count <= len(self.alive) // 2:
+            self.compact()
+
+    def compact(self): # drops the dead birds (the positions of the birds that are still alive shift down)
+        keep = self.alive
+        for name in self.FIELDS:
+            setattr(self, name, getattr(self, name)[keep])
     
+# vectorized versions of the neat-python activation functions (neat.activations), including the same clamping of their input
+VECTOR_ACTIVATIONS = {
+    neat.activations.sigmoid_activation: lambda z: 1.0 / (1.0 + np.exp(-np.clip(5.0*z, -60.0, 60.0))),
+    neat.activations.tanh_activation: lambda z: np.tanh(np.clip(2.5*z, -60.0, 60.0)),
+    neat.activations.sin_activation: lambda z: np.sin(np.clip(5.0*z, -60.0, 60.0)),
+    neat.activations.gauss_activation: lambda z: np.exp(-5.0*np.clip(z, -3.4, 3.4)**2),
+    neat.activations.relu_activation: lambda z: np.where(z > 0.0, z, 0.0),
+    neat.activations.identity_activation: lambda z: z,
+    neat.activations.clamped_activation: lambda z: np.clip(z, -1.0, 1.0),
+    neat.activations.abs_activation: lambda z: np.abs(z),
+}
+
+# BATCHNETWORK CLASS - evaluates the neural networks of a whole generation at once
+class BatchNetwork:
+    '''
+    FeedForwardNetwork.activate() walks a python dict for every node of every bird on every frame.
+    A BatchNetwork compiles all the networks of a generation into NumPy matrices instead:
+    - every node gets a depth (1 + the largest depth of the nodes feeding into it, inputs have depth 0).
+    - all nodes of the same depth are evaluated together, for every network at once, with one batched matrix multiplication.
+    - networks with fewer nodes at some depth are padded with zero weights, which are never read.
+
+    The values of all nodes are kept in one row per network: [inputs | depth 1 nodes | depth 2 nodes | ... | 0.0]
+    The last column is always 0.0 and is used for output nodes that are not connected to anything (neat returns 0.0 for them).
+
+    Outputs match FeedForwardNetwork.activate() up to floating point rounding (the weighted sums are added up in a different order).
+    '''
+    def __init__(self, num_inputs, layers, output_columns):
+        self.num_inputs = num_inputs
+        self.layers = layers # one (weights, bias, response, activations) tuple per depth
+        self.output_columns = output_columns
+        self.num_columns = num_inputs + sum(layer[0].shape[1] for layer in layers) + 1
+
+    @staticmethod
+    def create(genomes, config): # compiles a list of genomes (not (id, genome) pairs) in the same way as FeedForwardNetwork.create()
+        input_keys = config.genome_config.input_keys
+        output_keys = config.genome_config.output_keys
+        nets = [neat.nn.FeedForwardNetwork.create(g, config) for g in genomes]
+
+        # find the depth of every node in every network
+        depths = []
+        for net in nets:
+            depth = dict((key, 0) for key in input_keys)
+            for node, act_func, agg_func, bias, response, links in net.node_evals:
+                if agg_func is not neat.aggregations.sum_aggregation:
+                    raise RuntimeError("BatchNetwork only supports the sum aggregation function")
+                if act_func not in VECTOR_ACTIVATIONS:
+                    raise RuntimeError("BatchNetwork does not support the activation function {0}".format(act_func.__name__))
+                depth[node] = 1 + max(depth[i] for i, w in links)
+            depths.append(depth)
+        max_depth = max([max(depth.values()) for depth in depths] + [0])
+
+        # every depth gets a block of columns that is as wide as the network with the most nodes at that depth
+        widths = [0] * (max_depth + 1)
+        for net, depth in zip(nets, depths):
+            counts = [0] * (max_depth + 1)
+            for node_eval in net.node_evals:
+                counts[depth[node_eval[0]]] += 1
+            widths = [max(a, b) for a, b in zip(widths, counts)]
+        starts = [len(input_keys)] * (max_depth + 1)
+        for d in range(2, max_depth + 1):
+            starts[d] = starts[d - 1] + widths[d - 1]
+        zero_column = len(input_keys) + sum(widths)
+
+        layers = []
+        for d in range(1, max_depth + 1):
+            weights = np.zeros((len(nets), widths[d], starts[d]))
+            biases = np.zeros((len(nets), widths[d]))
+            responses = np.zeros((len(nets), widths[d]))
+            activations = [[neat.activations.identity_activation] * widths[d] for _ in nets]
+            layers.append((weights, biases, responses, activations))
+
+        output_columns = np.full((len(nets), len(output_keys)), zero_column)
+        for n, (net, depth) in enumerate(zip(nets, depths)):
+            column = dict((key, i) for i, key in enumerate(input_keys))
+            filled = [0] * (max_depth + 1)
+            for node, act_func, agg_func, bias, response, links in net.node_evals:
+                d = depth[node]
+                column[node] = starts[d] + filled[d]
+                weights, biases, responses, activations = layers[d - 1]
+                for i, w in links:
+                    weights[n, filled[d], column[i]] = w
+                biases[n, filled[d]] = bias
+                responses[n, filled[d]] = response
+                activations[n][filled[d]] = act_func
+                filled[d] += 1
+            for o, key in enumerate(output_keys):
+                if key in column:
+                    output_columns[n, o] = column[key]
+
+        # replace the activation functions by a boolean mask per function, so each one can be applied to all its nodes at once
+        compiled = []
+        for weights, biases, responses, activations in layers:
+            masks = []
+            for func in set(f for row in activations for f in row):
+                masks.append((VECTOR_ACTIVATIONS[func], np.array([[f is func for f in row] for row in activations])))
+            compiled.append((weights, biases, responses, masks))
+
+        return BatchNetwork(len(input_keys), compiled, output_columns)
+
+    def activate(self, inputs, rows): # inputs: one row of inputs per network in rows (the positions of the genomes to evaluate)
+        values = np.zeros((len(rows), self.num_columns))
+        values[:, :self.num_inputs] = inputs
+        start = self.num_inputs
+        for weights, biases, responses, masks in self.layers:
+            width = weights.shape[1]
+            s = np.matmul(weights[rows], values[:, :start, np.newaxis])[:, :, 0] # weighted sum of the inputs of every node
+            z = biases[rows] + responses[rows] * s
+            for func, mask in masks:
+                m = mask[rows]
+                values[:, start:start + width][m] = func(z[m])
+            start += width
+        return values[np.arange(len(rows))[:, np.newaxis], self.output_columns[rows]]
+
 # Pipe Class - represents the operations associated to the pipes
 class Pipe:
     GAP = 200
     VEL = 1
+    PIPE_TOP = LazyAsset(lambda: pygame.transform.flip(ASSETS.image("pipe"), False, True)) # flipped once and shared by every pipe
+    PIPE_BOTTOM = LazyAsset(lambda: ASSETS.image("pipe"))
+    TOP_MASK = LazyAsset(lambda: ASSETS.mask("pipe", flipped=True)) # built once and shared by every pipe
+    BOTTOM_MASK = LazyAsset(lambda: ASSETS.mask("pipe"))
+    WIDTH = LazyAsset(lambda: ASSETS.size("pipe")[0])
+    HEIGHT = LazyAsset(lambda: ASSETS.size("pipe")[1])
 
-    def __init__(self, x): # not considering 'y' because the position of the pipe in y-axis will be completely random
+    def __init__(self, x, rng=random): # not considering 'y' because the position of the pipe in y-axis will be completely random
         self.x = x
+        self.rng = rng # random number generator of the pipe course this pipe belongs to (see simulate())
         self.height = 0
 
         self.top = 0 # keeps track of where the top pipe will be drawn
         self.bottom = 0 # keeps track of where the bottom pipe will be drawn
-        self.PIPE_TOP = pygame.transform.flip(PIPE_IMG, False, True)
-        self.PIPE_BOTTOM = PIPE_IMG
 
         self.passed = False # indicates whether the bird has crossed the pipe or not (mainly for the purpose of detecting collision and AI)
         self.set_height() # defines where the top and bottom pipes are and how tall they are (defined randomly)
+
+    def reset(self, x): # turns this pipe into a brand new pipe at x (so that pipe objects can be reused, see PipeRing)
+        self.x = x
+        self.passed = False
+        self.set_height()
     
-    def set_height(self):
-        self.height = random.randrange(50, 450) # where the top pipe should appear
-        self.top = self.height - self.PIPE_TOP.get_height() 
+    def set_height(self, height=None):
+        if height is None:
+            height = self.rng.randrange(50, 450)
+        self.height = height # where the top pipe should appear
+        self.top = self.height - self.HEIGHT
         '''
         To position the top pipe,
         Height (we want the top pipe should appear - Total height of the Pipe Image)
@@ -165,16 +564,30 @@ class Pipe:
     In this way, we can determine if we had PICTURE-PERFECT COLLISION or not.
     '''
     def collide(self, bird): # used for the detection of PICTURE-PERFECT COLLISION
-        bird_mask = bird.get_mask() # mask for the bird
-        top_mask = pygame.mask.from_surface(self.PIPE_TOP) # mask for the top pipe
-        bottom_mask = pygame.mask.from_surface(self.PIPE_BOTTOM) # mask for the bottom pipe
+        return self.collide_mask(bird.get_mask(), bird.x, bird.y)
+
+    def collide_mask(self, bird_mask, bird_x, bird_y): # same as collide(), for a bird given by its mask and position
+        top_mask = self.TOP_MASK # mask for the top pipe
+        bottom_mask = self.BOTTOM_MASK # mask for the bottom pipe
+        bird_y = round(bird_y)
+        bird_width, bird_height = bird_mask.get_size()
+
+        '''
+        BROAD PHASE: two masks can only overlap if the rectangles around them overlap. Most of the time the bird is nowhere
+        near the pipe (or flies right through the gap), so checking the rectangles first lets us skip the pixel test.
+        The top pipe covers the y-range [top, height) and the bottom pipe [bottom, bottom + pipe height).
+        '''
+        if bird_x >= self.x + self.WIDTH or bird_x + bird_width <= self.x:
+            return False
+        hits_top = bird_y < self.height and bird_y + bird_height > self.top
+        hits_bottom = bird_y + bird_height > self.bottom and bird_y < self.bottom + bottom_mask.get_size()[1]
 
         # offset: calculates how far these masks are from each other
-        top_offset = (self.x - bird.x, self.top - round(bird.y)) # offset for bird and top pipe
-        bottom_offset = (self.x - bird.x, self.bottom - round(bird.y)) # offset for bird and bottom pipe
+        top_offset = (self.x - bird_x, self.top - bird_y) # offset for bird and top pipe
+        bottom_offset = (self.x - bird_x, self.bottom - bird_y) # offset for bird and bottom pipe
 
-        b_point = bird_mask.overlap(bottom_mask, bottom_offset) # for bottom pipe
-        t_point = bird_mask.overlap(top_mask, top_offset) # for top pipe
+        b_point = hits_bottom and bird_mask.overlap(bottom_mask, bottom_offset) # for bottom pipe
+        t_point = hits_top and bird_mask.overlap(top_mask, top_offset) # for top pipe
         '''
         bird_mask.overlap(bottom_mask, bottom_offset): tells us the first point of collision between the bird mask and the bottom pipe, 
         using bottom offset (ie. how far the bird is from the bottom pipe) 
@@ -186,11 +599,88 @@ class Pipe:
         
         return False
 
+    def collide_flock(self, birds): # returns the positions of all the birds in the flock that hit this pipe
+        # the same broad phase as in collide_mask(), done for the whole flock at once with NumPy
+        if birds.x >= self.x + self.WIDTH:
+            return []
+        y = np.round(birds.y) # np.round() rounds halves to even, just like round()
+        bottom = y + birds.get_heights()
+        near = birds.alive & (birds.x + birds.get_widths() > self.x) & (
+            ((y < self.height) & (bottom > self.top)) | ((bottom > self.bottom) & (y < self.bottom + self.HEIGHT)))
+
+        # pixel perfect test, only for the birds whose rectangle overlaps one of the pipes
+        near = np.flatnonzero(near)
+        return [x for x, y in zip(near.tolist(), birds.y[near].tolist()) if self.collide_mask(birds.get_mask(x), birds.x, y)]
+
+    @staticmethod
+    def collide_courses(pipes, birds, course): # collide_flock() for a flock that plays several courses (see simulate_courses())
+        '''
+        pipes: one pipe per course, all of them at the same x-position (None for a course that is over).
+        course: the course of every bird in the flock.
+        The broad phase is done once for the whole flock, with the pipe heights of the course of every bird, and only the
+        birds it flags get the pixel test against the pipe of their course.
+        '''
+        lead = next(pipe for pipe in pipes if pipe is not None)
+        if birds.x >= lead.x + lead.WIDTH:
+            return []
+        height = np.array([0 if pipe is None else pipe.height for pipe in pipes])[course]
+        top = height - lead.HEIGHT
+        bottom_pipe = height + lead.GAP
+        y = np.round(birds.y)
+        bottom = y + birds.get_heights()
+        near = birds.alive & (birds.x + birds.get_widths() > lead.x) & (
+            ((y < height) & (bottom > top)) | ((bottom > bottom_pipe) & (y < bottom_pipe + lead.HEIGHT)))
+
+        near = np.flatnonzero(near)
+        return [x for x, y, c in zip(near.tolist(), birds.y[near].tolist(), course[near].tolist())
+                if pipes[c].collide_mask(birds.get_mask(x), birds.x, y)]
+
+# PipeRing - the pipes that are currently in the game, oldest first
+class PipeRing:
+    '''
+    New pipes are always added at the right and pipes always leave the screen on the left, so the pipes on the screen can
+    be kept in a ring buffer with a fixed number of slots. The Pipe objects in the slots are created once and reused
+    (Pipe.reset()) when a slot is needed again, so no objects are created or thrown away while the game runs.
+    Only a few pipes ever fit on the screen at once, so the default capacity is plenty.
+    '''
+    def __init__(self, rng=random, capacity=4):
+        self.rng = rng # random number generator of the pipe course (see Pipe)
+        self.slots = [None] * capacity
+        self.start = 0 # slot of the oldest pipe
+        self.count = 0 # number of pipes in the ring
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i): # i-th oldest pipe
+        if not 0 <= i < self.count:
+            raise IndexError("pipe index out of range")
+        return self.slots[(self.start + i) % len(self.slots)]
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.slots[(self.start + i) % len(self.slots)]
+
+    def append(self, x): # adds a new pipe at x and returns it
+        if self.count == len(self.slots):
+            raise RuntimeError("more than {0} pipes in the game".format(len(self.slots)))
+        slot = (self.start + self.count) % len(self.slots)
+        if self.slots[slot] is None:
+            self.slots[slot] = Pipe(x, self.rng)
+        else:
+            self.slots[slot].reset(x)
+        self.count += 1
+        return self.slots[slot]
+
+    def popleft(self): # removes the oldest pipe (its object stays in the slot, to be reused later)
+        self.start = (self.start + 1) % len(self.slots)
+        self.count -= 1
+
 # Base class: represent the operations associated to the base
 class Base:
     VEL = 1 # velocity of both the pipe and the base should be same, otherwise they will appear to move at different speeds
-    WIDTH = BASE_IMG.get_width()
-    IMG = BASE_IMG
+    WIDTH = LazyAsset(lambda: ASSETS.size("base")[0])
+    IMG = LazyAsset(lambda: ASSETS.image("base"))
 
     def __init__(self, y): # not considering 'x' as the base will be moving to the left, thus 'x' need not to be defined
         self.y = y
@@ -211,24 +701,115 @@ class Base:
         win.blit(self.IMG, (self.x1, self.y)) # draws the first base image
         win.blit(self.IMG, (self.x2, self.y)) # draws the second base image
 
-def draw_window(win, birds, pipes, base, score, gen): # used to draw background image and then the bird on top of it just to see how the bird works when it is moving
-    win.blit(BG_IMG, (0,0)) # blit() simply means draw. it simply draws whatever is passed in it on the game window
+# the score and the generation only change once in a while, so their texts are rendered once and reused
+@functools.lru_cache(maxsize=32)
+def render_text(text):
+    return ASSETS.font().render(text, 1,(255,255,255))
+
+def draw_window(win, birds, pipes, base, score, gen, shown=None, animate=True): # used to draw background image and then the bird on top of it just to see how the bird works when it is moving
+    win.blit(ASSETS.image("bg"), (0,0)) # blit() simply means draw. it simply draws whatever is passed in it on the game window
     for pipe in pipes:
         pipe.draw(win)
 
-    text = STAT_FONT.render("Score : " + str(score), 1,(255,255,255)) # for the score text
+    text = render_text("Score : " + str(score)) # for the score text
     win.blit(text, (WIN_WIDTH-10-text.get_width(), 10)) # creates a score text on the game window
 
-    text = STAT_FONT.render("Gen : " + str(gen), 1,(255,255,255)) # for the Generation text
+    text = render_text("Gen : " + str(gen)) # for the Generation text
     win.blit(text, (10, 10)) # creates a Generation text on the game window
 
     base.draw(win)
 
-    for bird in birds:
-        bird.draw(win) # calls user-defined function draw() which will handle all the animation, tilting for us and also draws the bird
+    birds.draw(win, shown, animate) # calls Flock.draw() which will handle all the animation, tilting for us and also draws every bird (or the ones in shown)
 
     pygame.display.update() # simply updates the display and refreshes it
 
+# StepClock - decides when the next step of a windowed game is due
+class StepClock:
+    '''
+    Every step of the game moves everything by the same amount, so the game runs in real time when we do STEPS_PER_SEC steps
+    every second, no matter how long one step takes to simulate or draw. The clock keeps a schedule (a fixed time step):
+    the next step is due 1 / (STEPS_PER_SEC * speed) seconds after the previous one and wait() sleeps until then.
+    If we fall behind (eg. drawing takes too long), the schedule starts over from now instead of rushing through the
+    missed steps.
+    - speed 1: real time (30 steps every second).
+    - speed N: N times faster than real time.
+    - speed None: unlocked, wait() never sleeps, so the game runs as fast as it can while still being drawn.
+    The screen cannot show more than STEPS_PER_SEC frames every second anyway, so above real time draw_due() only asks
+    for a frame every 1 / STEPS_PER_SEC seconds and the steps in between are not drawn.
+    '''
+    STEPS_PER_SEC = 30
+    MAX_LAG = 0.25 # seconds we can fall behind the schedule before it starts over
+
+    def __init__(self, speed=1):
+        self.set_speed(speed)
+
+    def set_speed(self, speed):
+        self.speed = speed
+        self.next_step = self.next_draw = time.perf_counter()
+
+    def wait(self): # sleeps until the next step is due
+        if self.speed is None:
+            return
+        now = time.perf_counter()
+        if self.next_step > now:
+            time.sleep(self.next_step - now)
+        elif now - self.next_step > self.MAX_LAG:
+            self.next_step = now
+        self.next_step += 1.0 / (self.STEPS_PER_SEC * self.speed)
+
+    def draw_due(self): # whether the step that is about to run should be drawn
+        if self.speed is not None and self.speed <= 1:
+            return True
+        now = time.perf_counter()
+        if now < self.next_draw:
+            return False
+        self.next_draw = now + 1.0 / self.STEPS_PER_SEC
+        return True
+
+def speed_caption(speed):
+    return "Flappy Bird - " + ("unlocked" if speed is None else "{0:g}x".format(speed))
+
+def change_speed(key, clock): # keys to change the speed while the game runs: 1 real time, + faster, - slower, U unlocked
+    global SPEED
+    speed = clock.speed
+    if key == pygame.K_1:
+        speed = 1
+    elif key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS) and speed is not None:
+        speed *= 2
+    elif key in (pygame.K_MINUS, pygame.K_KP_MINUS) and speed is not None:
+        speed = max(1, speed / 2)
+    elif key == pygame.K_u:
+        speed = None if speed is not None else 1
+    else:
+        return
+    SPEED = speed # the next generations keep running at this speed
+    clock.set_speed(speed)
+    pygame.display.set_caption(speed_caption(speed))
+
+# PhaseTimes - adds up where the time of the game loop goes
+class PhaseTimes:
+    PHASES = ("wait", "events", "move", "activate", "collide", "pipes", "draw", "record") # the phases of one frame, in order
+    # (wait: the frame limiter of a windowed run sleeping until the next step is due, see StepClock)
+
+    def __init__(self):
+        self.seconds = dict((phase, 0.0) for phase in self.PHASES)
+        self.frames = 0 # frames simulated
+        self.bird_frames = 0 # frames simulated times the number of birds alive in each of them
+
+    def lap(self, phase, start): # adds the time since start to phase and returns the current time (the start of the next phase)
+        now = time.perf_counter()
+        self.seconds[phase] += now - start
+        return now
+
+    def as_dict(self): # plain dict, so it can be sent back from a worker process
+        return {"seconds": self.seconds, "frames": self.frames, "bird_frames": self.bird_frames}
+
+    def add(self, times): # adds the dict of another PhaseTimes (eg. from a worker process) to this one
+        for phase, seconds in times["seconds"].items():
+            self.seconds[phase] += seconds
+        self.frames += times["frames"]
+        self.bird_frames += times["bird_frames"]
+
 '''
 We are using NEAT neural network as an AI that plays on game.
 INPUTS: position of bird along y-axis (not x as the bird will not be moving along x-axis),
@@ -251,62 +832,111 @@ MAX GENERATIONS: 30 (indicates that if even after 30 generations, the AI does no
 def main(genomes, config): # it is a must to Genomes and Config as parameters, whenever we define the fitness function for NEAT
     global GEN
     GEN += 1
-    nets = []
+    seed = random.randrange(2**32) # every generation plays on a new pipe course, which is completely defined by this seed
+    seeds = [seed] + [random.randrange(2**32) for _ in range(COURSES - 1)] # and on COURSES - 1 more courses if asked for
+
+    recorder = None
+    if RECORD_DIR is not None and EVALUATOR is None: # record the generation, so it can be watched later (see replay())
+        recorder = recording.Recorder(os.path.join(RECORD_DIR, "gen-{0}.fbr".format(GEN)), len(genomes), GEN, seed, 230)
+
+    if EVALUATOR is not None: # spread the genomes over the worker processes
+        EVALUATOR.evaluate(genomes, config, seeds, TIMINGS, AGGREGATE, MAX_FRAMES)
+    elif COURSES > 1: # all the courses are played at once, headless
+        simulate_courses(genomes, config, seeds, AGGREGATE, TIMINGS, MAX_FRAMES)
+    elif HEADLESS or (GEN - 1) % RENDER_EVERY != 0: # a headless run never touches the display server
+        # but a window that is already open (from the last generation we drew) keeps answering its events
+        poll = not HEADLESS and pygame.display.get_surface() is not None
+        simulate(genomes, config, seed, times=TIMINGS, max_frames=MAX_FRAMES, recorder=recorder, poll=poll)
+    else:
+        simulate(genomes, config, seed, pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT)), TIMINGS, MAX_FRAMES, recorder=recorder)
+
+def simulate(genomes, config, seed, win=None, times=None, max_frames=None, nets=None, recorder=None, poll=False): # plays one game with a bird for every genome and sets their fitness
+    '''
+    The pipe heights come from a random number generator seeded with seed, so the same seed always gives the same pipe course.
+    A bird never affects another bird (they all share the same x-position and the pipes only depend on time), so the fitness of
+    a genome only depends on the genome and the seed, no matter which other genomes are simulated together with it.
+    This is what lets ParallelEvaluator split a generation over several processes and still get the same fitness values.
+
+    The game is drawn into win, or nothing is drawn at all if win is None (headless).
+    If times is a PhaseTimes, the time spent in every phase of the game loop is added to it.
+    If max_frames is set, the game stops after that many frames even if some birds are still alive.
+    nets can replace the BatchNetwork of the genomes by anything else with the same activate() (see play()).
+    If recorder is a recording.Recorder, the pipes and the birds of every frame are recorded to it (and it is closed at the end).
+    Returns the score of the game.
+    A windowed game runs at SPEED (see StepClock) and looks at the window events every POLL_EVERY steps. The speed only
+    changes how fast the game is played and drawn, never what happens in it.
+    If poll is True, a game that is not drawn still looks at the events of the open window every IDLE_POLL_EVERY frames,
+    so the window can be closed and the speed keys work while a windowed run plays a generation it does not draw.
+    '''
+    rng = random.Random(seed)
     ge = []
-    birds = []
     '''
-    We use above lists to:
-    - keep a track of neural network that controls each bird because they genomes, when they come are just a bunch of neural
-      networks that are going to control each of our birds.
-    - keep track of the genomes so that we can change their fitness based on how far they move or if they hit a pipe etc.
-    - keep track of the bird that that neural network is controlling, so where that position is in the screen.
-
-    The reason we are using 3 lists is so that each position in this list will correspond to the same bird, ie.
-    Index 0 -> will have the neural network for Bird0, the genome for Bird0 and the actual bird object (that we have created for Bird0 to
-               keep a track of where it is).
+    We use:
+    - a list of the genomes and an array with their fitness, which we change based on how far they move or if they hit a
+      pipe etc. (the fitness is only copied to the genomes once the game is over).
+    - a BatchNetwork, which holds the neural networks of all the genomes (they control each of our birds) and evaluates
+      them all at once.
+    - a Flock, which keeps track of where every bird is in the screen.
+
+    Position 0 in the list, the fitness array, the BatchNetwork and the Flock all belong to Bird0 and so on. When a bird dies
+    it is only marked as dead in the flock (birds.alive); the flock remembers the position of the genome of every bird
+    (birds.ids), because it compacts itself from time to time, so the genomes and the networks never have to be removed.
     '''
 
     for _, g in genomes:
-        '''
-        We are going to setup a neural network for that genome and a bird object for it and then just keep track of that genome
-        in a list.
-        '''
-        # set up the neural network for our genome
-        net = neat.nn.FeedForwardNetwork.create(g, config)
-
-        # append it to the list
-        nets.append(net)
-
-        # append a bird object to the list which will be with the above neural network
-        birds.append(Bird(230, 350)) # create a standard Bird object that is going to start at the same position 
-                                     # of all of our other bird objects.
-
         g.fitness = 0
-        # append the actual genome to the list in the same object as the bird object and the neural network 
-        # (to keep a track of its fitness and change it as we desire)
+        # append the actual genome to the list (to keep a track of its fitness and change it as we desire)
         ge.append(g)
 
+    # set up the neural networks for all our genomes
+    if nets is None:
+        nets = BatchNetwork.create(ge, config)
+    fitness = np.zeros(len(ge))
 
+    birds = Flock(len(ge), 230, 350) # one bird per genome, all of them starting at the same position
 
     base = Base(730)
-    pipes = [Pipe(700)]
-    win = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
-    clock = pygame.time.Clock() # clock object
+    pipes = PipeRing(rng)
+    pipes.append(700)
+    if recorder is not None:
+        recorder.pipe(0, pipes[0].height)
+    clock = None
+    if win is not None or poll:
+        clock = StepClock(SPEED) # decides when the next step runs (and keeps the speed the keys change)
+    if win is not None:
+        pygame.display.set_caption(speed_caption(SPEED))
     run = True
     score = 0
+    frames = 0
 
     # setup the main game loop for our pygame window
     while run:
-        for event in pygame.event.get(): 
-            clock.tick(30) # atmost 30 ticks every second
-            '''
-            this loop keeps track of whenever something happens like whenever user clicks the mouse 
-            it will run this loop and loop through all the events and then do something with that
-            '''
-            if event.type == pygame.QUIT:
-                run = False
-                pygame.quit()
-                quit()
+        if times is not None:
+            t = time.perf_counter()
+
+        # only one of every RENDER_FRAME_SKIP frames is drawn (and above real time, only as many as the screen can show)
+        render = win is not None and frames % RENDER_FRAME_SKIP == 0 and clock.draw_due()
+
+        if win is not None:
+            clock.wait() # atmost SPEED * 30 steps every second
+            if times is not None:
+                t = times.lap("wait", t)
+        if (win is not None and frames % POLL_EVERY == 0) or (poll and frames % IDLE_POLL_EVERY == 0):
+            for event in pygame.event.get(): 
+                '''
+                this loop keeps track of whenever something happens like whenever user clicks the mouse 
+                it will run this loop and loop through all the events and then do something with that
+                '''
+                if event.type == pygame.KEYDOWN:
+                    change_speed(event.key, clock)
+                if event.type == pygame.QUIT:
+                    run = False
+                    for g, f in zip(ge, fitness.tolist()):
+                        g.fitness = f
+                    if recorder is not None:
+                        recorder.close()
+                    pygame.quit()
+                    raise StopTraining() # run() stops the training (everything up to the last checkpoint is kept)
 
         '''
         We have to move the birds based on their neural network.
@@ -319,53 +949,70 @@ def main(genomes, config): # it is a must to Genomes and Config as parameters, w
         '''
         pipe_ind = 0
         if len(birds) > 0:
-            if len(pipes) > 1 and birds[0].x > pipes[0].x + pipes[0].PIPE_TOP.get_width():
+            if len(pipes) > 1 and birds.x > pipes[0].x + pipes[0].WIDTH:
                 pipe_ind = 1
         else: # if there are no birds left -> quit the game
             run = False 
             break
+        if frames == max_frames: # played long enough
+            break
+        frames += 1
+
+        if times is not None:
+            times.frames += 1
+            times.bird_frames += len(birds)
+            t = times.lap("events", t)
 
-        # move the bird (jumping) 
+        # move the birds (jumping) 
         # we will check the output of the neural network associated to the bird and if it is greater than 0.5, we will make the bird jump.
-        for x, bird in enumerate(birds):
-            bird.move()
-            ge[x].fitness += 0.1 # set the fitness of the bird
+        birds.move()
+        alive = birds.alive
+        alive_ids = birds.ids[alive] # positions of the genomes of the birds that are still alive
+        fitness[alive_ids] += 0.1 # set the fitness of the bird
             # we are giving it a little bit of fitness for surviving this long
             # this way we are encouraging the bird to keep moving forward and stay on the screen, rather than fly off the screen
+        if times is not None:
+            t = times.lap("move", t)
 
-            # activate neural network with our inputs (tuple of inputs)
-            output = nets[x].activate((bird.y, abs(bird.y - pipes[pipe_ind].height), abs(bird.y - pipes[pipe_ind].bottom)))
+        # activate the neural networks of the birds that are still alive with our inputs (one row of inputs per bird)
+        y = birds.y[alive]
+        inputs = np.column_stack((y, np.abs(y - pipes[pipe_ind].height), np.abs(y - pipes[pipe_ind].bottom)))
+        output = nets.activate(inputs, alive_ids)
 
-            # check if the ouput is greater than 0.5. If yes, make the bird JUMP
-            if output[0] > 0.5:
-                bird.jump()
+        # check if the ouput is greater than 0.5. If yes, make the bird JUMP
+        jumping = alive.copy()
+        jumping[alive] = output[:, 0] > 0.5
+        birds.jump(jumping)
+        if times is not None:
+            t = times.lap("activate", t)
 
         add_pipe = False
-        rem = []
+        rem = 0
         for pipe in pipes:
-            for x, bird in enumerate(birds): # this way we can get the position in the list of where this bird is
-                if pipe.collide(bird):
-                    ge[x].fitness -= 1 
-                    '''
-                    everytime bird hits a pipe, it is going to have 1 removed from its fitness score, 
-                    so that we do not favor birds that make it far but just ram themselves into the pipe all the time.
-                    we want to make sure that if a bird hits a pipe and another bird (which is at the same level, but did not 
-                    hit the pipe), then the bird that did not hit should have a higher fitness score, that we encourage it to go
-                    in between pipes.
-                    '''
-                    # remove the bird, the neural network associated with it and genome from the lists 
-                    birds.pop(x)
-                    nets.pop(x)
-                    ge.pop(x)
-                if not pipe.passed and pipe.x < bird.x: # checks if we have passed the pipes or not
-                    pipe.passed = True
-                    add_pipe = True # as soon as we pass the pipe, generate a new one
-
-            if pipe.x + pipe.PIPE_TOP.get_width() < 0: # remove the pipe that is not in window
-                rem.append(pipe)
+            dead = pipe.collide_flock(birds) # positions of the birds in the flock that hit the pipe
+            fitness[birds.ids[dead]] -= 1
+            '''
+            everytime bird hits a pipe, it is going to have 1 removed from its fitness score, 
+            so that we do not favor birds that make it far but just ram themselves into the pipe all the time.
+            we want to make sure that if a bird hits a pipe and another bird (which is at the same level, but did not 
+            hit the pipe), then the bird that did not hit should have a higher fitness score, that we encourage it to go
+            in between pipes.
+            '''
+            if len(birds) > 0 and not pipe.passed and pipe.x < birds.x: # checks if we have passed the pipes or not
+                pipe.passed = True
+                add_pipe = True # as soon as we pass the pipe, generate a new one
+
+            # the birds that hit the pipe die (only after checking every bird, so that a dying bird never makes us skip the bird after it)
+            if dead:
+                birds.kill(dead)
+
+            if pipe.x + pipe.WIDTH < 0: # remove the pipe that is not in window
+                rem += 1 # the pipes leave the window in the order they came in, so these are always the oldest pipes
                 
         
             pipe.move()
+        if times is not None:
+            t = times.lap("collide", t)
 
         if add_pipe:
             score +=1 # update the score every time the bird passes the pipes
@@ -376,57 +1023,598 @@ def main(genomes, config): # it is a must to Genomes and Config as parameters, w
             - the reason we are doing this is to encourage the bird to go through the pipes, rather than just making it
               further in the level, but ramming themselves into the pipe.
             '''
-            for g in ge:
-                g.fitness += 5
+            fitness[birds.ids[birds.alive]] += 5
             '''
-            - the reason we can do this, without having to loop through the bird is because if we have to remove a bird,
-              we are removing its genome as well from that list.
-            - so any genome that is actually in this list is still alive and if it made it through the pipe, then it will gain
+            - the reason we can do this, without having to loop through the pipes is because if a bird dies,
+              we mark it as dead in the flock.
+            - so any genome whose bird is still alive in the flock, if it made it through the pipe, will gain
               5 to its fitness score.  
             '''
-            pipes.append(Pipe(700)) # add new pipes after the bird has passed the previous ones
+            pipe = pipes.append(700) # add new pipes after the bird has passed the previous ones
+            if recorder is not None:
+                recorder.pipe(frames, pipe.height)
             
-        for r in rem: # remove the pipes that were out of the window
-            pipes.remove(r)
-
-        for x, bird in enumerate(birds):
-            # checks if any of our birds hits the ground or if the bird has flown off the screen -> make them die
-            if bird.y + bird.img.get_height() > 730 or bird.y < 0: 
-                birds.pop(x)
-                nets.pop(x)
-                ge.pop(x)
+        for _ in range(rem): # remove the pipes that were out of the window
+            pipes.popleft()
 
         base.move()
-        draw_window(win, birds, pipes, base, score, GEN)
+        if times is not None:
+            t = times.lap("pipes", t)
 
-def run(config_path):
-    # load the configuration file
-    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, 
-                                neat.DefaultSpeciesSet, neat.DefaultStagnation, 
-                                config_path) # defines all the sub-headings used in the config file
-    
-    # set the population
-    p = neat.Population(config) # generates population based on the info in the config file
-    
-    # adding stats reporters / set up the output that we are going to see
-    p.add_reporter(neat.StdOutReporter(True))
-    stats = neat.StatisticsReporter()
-    p.add_reporter(stats)
+        # checks if any of our birds hits the ground or if the bird has flown off the screen -> make them die
+        birds.kill(birds.alive & ((birds.y + birds.get_heights() > 730) | (birds.y < 0)))
+        if times is not None:
+            t = times.lap("collide", t)
+
+        if not render:
+            # nothing is drawn, but the flapping animation still has to advance because it decides which image
+            # (and therefore which collision mask) every bird uses in the next frame
+            birds.animate()
+        else:
+            shown = None
+            if RENDER_TOP_K is not None and RENDER_TOP_K < len(birds): # only the best placed birds that are still alive
+                '''
+                Every bird that is still alive has exactly the same fitness (they all get the same rewards every frame,
+                and only dying costs fitness), so the fitness cannot tell the birds apart. Instead we show the birds that
+                are closest to the centre of the gap of the next pipe, which are the ones most likely to make it through.
+                '''
+                alive = np.flatnonzero(birds.alive)
+                pipe = pipes[1] if len(pipes) > 1 and birds.x > pipes[0].x + pipes[0].WIDTH else pipes[0]
+                centre = birds.y[alive] + birds.get_heights()[alive] / 2 # centre of every bird
+                miss = np.abs(centre - (pipe.height + pipe.GAP / 2))
+                shown = alive[np.argpartition(miss, RENDER_TOP_K)[:RENDER_TOP_K]]
+            draw_window(win, birds, pipes, base, score, GEN, shown)
+        if times is not None:
+            t = times.lap("draw", t)
+
+        if recorder is not None: # the birds as they are drawn in this frame
+            alive = birds.alive
+            recorder.frame(birds.ids[alive], birds.y[alive], birds.tilt[alive], birds.img_index[alive])
+            if times is not None:
+                times.lap("record", t)
+
+    for g, f in zip(ge, fitness.tolist()): # the game is over, hand the fitness to the genomes
+        g.fitness = f
+    if recorder is not None:
+        recorder.close()
+    return score
+
+# how simulate_courses() turns the fitness of every genome on every course (one row per course) into one fitness per genome
+COURSE_AGGREGATES = {
+    "mean": lambda fitness: fitness.mean(axis=0), # the fitness we expect on a new course
+    "min": lambda fitness: fitness.min(axis=0), # the fitness on the hardest course (only genomes that do well everywhere score high)
+}
+
+def simulate_courses(genomes, config, seeds, aggregate="mean", times=None, max_frames=None): # plays every genome on every course in seeds, all at once
+    '''
+    A single course is a noisy measure of how good a genome is: a few easy pipes can make a poor genome look good. Here every
+    genome plays one game per seed (see simulate()) and gets the aggregate (see COURSE_AGGREGATES) of its fitness values.
+
+    The courses are not played one after the other. There is one bird for every (course, genome) pair in a single Flock,
+    bird number course * len(genomes) + genome, and one PipeRing per course, so moving the birds and activating their
+    networks is done for all the courses at once. The pipes of a course only move and get passed depending on time, so every
+    course that still has birds alive has its pipes at the same x-positions (only their heights differ): the collisions with
+    the i-th pipe of every course are tested at once (see Pipe.collide_courses()).
+    A course whose birds are all dead is not looked at anymore, and the game stops when every course is over or after
+    max_frames frames.
+
+    Every bird only sees the pipes of its own course, so the fitness of a genome on a course is exactly the fitness simulate()
+    gives it on that seed. Returns the score of every course.
+    '''
+    ge = [g for _, g in genomes]
+    size = len(ge)
+    nets = BatchNetwork.create(ge, config)
+    fitness = np.zeros(len(seeds) * size) # fitness of every bird (every genome on every course)
+
+    birds = Flock(len(fitness), 230, 350)
+    courses = []
+    for seed in seeds:
+        pipes = PipeRing(random.Random(seed))
+        pipes.append(700)
+        courses.append(pipes)
+    scores = [0] * len(seeds)
+    playing = list(range(len(seeds))) # the courses that still have birds alive
+    heights = np.zeros(len(seeds)) # height and bottom of the pipe every course feeds to its networks
+    bottoms = np.zeros(len(seeds))
+    frames = 0
+
+    while len(birds) > 0 and frames != max_frames:
+        if times is not None:
+            t = time.perf_counter()
+        for c in playing: # the pipe in front of the birds of every course (same rule as in simulate())
+            pipes = courses[c]
+            pipe = pipes[1] if len(pipes) > 1 and birds.x > pipes[0].x + pipes[0].WIDTH else pipes[0]
+            heights[c], bottoms[c] = pipe.height, pipe.bottom
+        frames += 1
+        if times is not None:
+            times.frames += 1
+            times.bird_frames += len(birds)
+            t = times.lap("events", t)
+
+        birds.move()
+        alive = birds.alive
+        alive_ids = birds.ids[alive]
+        fitness[alive_ids] += 0.1
+        if times is not None:
+            t = times.lap("move", t)
+
+        y = birds.y[alive]
+        course = alive_ids // size
+        inputs = np.column_stack((y, np.abs(y - heights[course]), np.abs(y - bottoms[course])))
+        output = nets.activate(inputs, alive_ids % size) # every bird uses the network of its genome
+        jumping = alive.copy()
+        jumping[alive] = output[:, 0] > 0.5
+        birds.jump(jumping)
+        if times is not None:
+            t = times.lap("activate", t)
+
+        # the same pipe logic as in simulate(), for all the courses that are still played at once
+        course = birds.ids // size
+        add_pipe = np.zeros(len(seeds), dtype=bool)
+        rem = 0
+        for i in range(len(courses[playing[0]])): # (the courses that are played all have the same number of pipes)
+            pipes = [None] * len(seeds)
+            for c in playing:
+                pipes[c] = courses[c][i]
+            dead = Pipe.collide_courses(pipes, birds, course)
+            fitness[birds.ids[dead]] -= 1
+            pipe = pipes[playing[0]]
+            if not pipe.passed and pipe.x < birds.x:
+                left = np.bincount(course[birds.alive], minlength=len(seeds)) # the courses that still have birds
+                for c in playing:
+                    if left[c] > 0:
+                        pipes[c].passed = True
+                        add_pipe[c] = True
+            if dead:
+                birds.kill(dead)
+                course = birds.ids // size # (the flock may have been compacted)
+            if pipe.x + pipe.WIDTH < 0:
+                rem += 1
+            for c in playing:
+                pipes[c].move()
+        if times is not None: # (the same phases as in simulate(), so the timings of both can be compared)
+            t = times.lap("collide", t)
+
+        if add_pipe.any():
+            alive = birds.alive
+            fitness[birds.ids[alive]] += np.where(add_pipe, 5.0, 0.0)[course[alive]] # (adding 0.0 leaves the fitness as it is)
+        for c in playing:
+            if add_pipe[c]:
+                scores[c] += 1
+                courses[c].append(700)
+            for _ in range(rem):
+                courses[c].popleft()
+        if times is not None:
+            t = times.lap("pipes", t)
+
+        birds.kill(birds.alive & ((birds.y + birds.get_heights() > 730) | (birds.y < 0)))
+        left = np.bincount(birds.ids[birds.alive] // size, minlength=len(seeds)) # birds alive on every course
+        playing = [c for c in playing if left[c] > 0]
+        if times is not None:
+            t = times.lap("collide", t)
+
+        birds.animate() # the image of every bird decides its collision mask in the next frame
+        if times is not None:
+            times.lap("draw", t)
+
+    for g, f in zip(ge, COURSE_AGGREGATES[aggregate](fitness.reshape(len(seeds), size)).tolist()):
+        g.fitness = f
+    return scores
+
+def evaluate_chunk(genomes, config, seeds, timed=False, aggregate="mean", max_frames=None): # runs in a worker process, returns the fitness of every genome
+    times = PhaseTimes() if timed else None
+    if len(seeds) == 1:
+        simulate(genomes, config, seeds[0], times=times, max_frames=max_frames)
+    else:
+        simulate_courses(genomes, config, seeds, aggregate, times, max_frames)
+    return [g.fitness for _, g in genomes], times.as_dict() if timed else None # the timings as well if they were asked for
+
+# ParallelEvaluator - evaluates a generation on several cores at once
+class ParallelEvaluator:
+    '''
+    The genomes of a generation are split into one chunk per worker process and every worker simulates its chunk headless
+    on the same pipe courses (same seeds). Since the fitness of a genome does not depend on the other genomes in its game
+    (see simulate()), the result is exactly the fitness we would get by simulating the whole generation in one process.
     '''
-    Whenever we are running the algorithm, rather than not seeing anything happen in the console, we will see
-    detailed statistics of each generation (like best fitness etc.)
+    def __init__(self, num_workers=None): # by default we use one worker per core
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.pool = multiprocessing.Pool(self.num_workers)
+
+    def evaluate(self, genomes, config, seeds, times=None, aggregate="mean", max_frames=None): # the timings of all the workers are added to times (a PhaseTimes)
+        size = -(-len(genomes) // self.num_workers) # genomes per chunk, rounded up
+        chunks = [genomes[i:i + size] for i in range(0, len(genomes), size)]
+        jobs = [self.pool.apply_async(evaluate_chunk, (chunk, config, seeds, times is not None, aggregate, max_frames))
+                for chunk in chunks]
+
+        # the workers got copies of the genomes, so copy the fitness values back into our genomes
+        for chunk, job in zip(chunks, jobs):
+            fitnesses, chunk_times = job.get()
+            for (_, g), fitness in zip(chunk, fitnesses):
+                g.fitness = fitness
+            if times is not None:
+                times.add(chunk_times)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+# PhaseTimingReporter - a NEAT reporter that writes where the time of every generation went
+class PhaseTimingReporter(neat.reporting.BaseReporter):
+    '''
+    While this reporter is installed, simulate() times every phase of the game loop (see PhaseTimes). After every generation
+    one record is written to filename: a CSV file with one row per generation, or a JSON list if filename ends with .json.
+    - seconds: wall time of the evaluation of the generation.
+    - frames_per_sec / bird_frames_per_sec: frames (and frames times birds alive) simulated per second of wall time.
+      With several worker processes, the frames of all of them are added up.
+    - <phase>_sec / <phase>_pct: time spent in every phase (added up over all processes) and its share of the total.
+    '''
+    def __init__(self, filename):
+        self.filename = filename
+        self.records = []
+        self.start = None
+        self.times = None
+
+    def start_generation(self, generation):
+        global TIMINGS
+        self.generation = generation
+        self.times = TIMINGS = PhaseTimes()
+        self.start = time.perf_counter()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        global TIMINGS
+        seconds = time.perf_counter() - self.start
+        TIMINGS = None # nothing else (eg. reproduction) should be timed
+
+        total = sum(self.times.seconds.values()) or 1.0
+        record = {"generation": self.generation, "seconds": seconds, "frames": self.times.frames,
+                  "bird_frames": self.times.bird_frames, "frames_per_sec": self.times.frames / seconds,
+                  "bird_frames_per_sec": self.times.bird_frames / seconds}
+        for phase in PhaseTimes.PHASES:
+            record[phase + "_sec"] = self.times.seconds[phase]
+            record[phase + "_pct"] = 100.0 * self.times.seconds[phase] / total
+        self.records.append(record)
+        self.save()
+
+    def save(self): # the whole file is written again, so it is always complete even if training is stopped
+        with open(self.filename, "w", newline="") as f:
+            if self.filename.endswith(".json"):
+                json.dump(self.records, f, indent=1)
+            else:
+                writer = csv.DictWriter(f, fieldnames=list(self.records[0]))
+                writer.writeheader()
+                writer.writerows(self.records)
+
+def export_champion(genome, config, filename): # compiles a genome into a champion file, which runs without neat (see champion.py)
+    net = neat.nn.FeedForwardNetwork.create(genome, config) # node_evals are already in topological order
+    activation_names = dict((f, name) for name, f in config.genome_config.activation_defs.functions.items())
+    aggregation_names = dict((f, name) for name, f in config.genome_config.aggregation_function_defs.functions.items())
+
+    position = dict((key, i) for i, key in enumerate(net.input_nodes)) # where the value of every node is kept
+    nodes = []
+    for node, act_func, agg_func, bias, response, links in net.node_evals:
+        position[node] = len(position)
+        nodes.append((activation_names[act_func], aggregation_names[agg_func], bias, response, 
+                      [(position[i], w) for i, w in links]))
+    outputs = [position.get(key, -1) for key in net.output_nodes]
+    champion.Champion(len(net.input_nodes), outputs, nodes).save(filename)
+
+# ChampionNetworks - lets a champion (see champion.py) control the birds of simulate(), in place of a BatchNetwork
+class ChampionNetworks:
+    def __init__(self, net):
+        self.net = net
+
+    def activate(self, inputs, rows): # the same net controls every bird
+        return np.array([self.net.activate(x) for x in inputs.tolist()])
+
+def play(filename, seed=None): # lets the champion in filename play game after game in a window, until it is closed
+    global GEN
+    net = ChampionNetworks(champion.load(filename))
+    rng = random.Random(seed)
+    win = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+    try:
+        while True:
+            GEN += 1 # shown as the number of the game
+            bird = types.SimpleNamespace(fitness=0) # simulate() wants a genome to set the fitness of
+            score = simulate([(0, bird)], None, rng.randrange(2**32), win, nets=net)
+            print("Game {0}: score {1}, fitness {2:.1f}".format(GEN, score, bird.fitness))
+    except StopTraining: # the window was closed
+        pass
+
+# Replay - draws the frames of a recording (see recording.py) with the same code as the game, without simulating anything
+class Replay:
+    def __init__(self, rec):
+        self.rec = rec # a recording.Recording
+        self.pipes = [] # a Pipe for every recorded pipe, created the first time it is on the screen
+        self.rng = random.Random(0) # for the Pipe objects (their heights come from the recording)
+        self.base = Base(730)
+        self.base_frame = 0 # number of times the base has moved
+
+    def draw(self, win, frame):
+        '''
+        In the game, a pipe is created at x = 700 and moves Pipe.VEL to the left every frame after that, the base moves once
+        every frame, and the score goes up by one every time a new pipe is created. So the whole screen follows from the
+        frame number and the recorded pipes.
+        '''
+        pipes = []
+        score = 0
+        for i, (created, height) in enumerate(self.rec.pipes):
+            if created > frame:
+                break
+            if created > 0:
+                score += 1
+            x = 700 - (frame - created) * Pipe.VEL
+            if x + Pipe.WIDTH > 0: # the pipe is still on the screen
+                while len(self.pipes) <= i:
+                    self.pipes.append(Pipe(700, self.rng))
+                self.pipes[i].x = x
+                self.pipes[i].set_height(height)
+                pipes.append(self.pipes[i])
+
+        if frame < self.base_frame: # going back, start the base over
+            self.base = Base(730)
+            self.base_frame = 0
+        while self.base_frame < frame:
+            self.base.move()
+            self.base_frame += 1
+
+        ids, y, tilt, img_index = self.rec.frame(frame)
+        birds = Flock(len(ids), self.rec.bird_x, 0)
+        birds.y[:] = y
+        birds.tilt[:] = tilt
+        birds.img_index[:] = img_index
+        birds.ids = ids
+        draw_window(win, birds, pipes, self.base, score, self.rec.generation, animate=False)
+
+def replay(filename, frame=1): # watches a recorded generation (see RECORD_DIR) in a window, until the window is closed
+    '''
+    Keys: SPACE pauses, LEFT / RIGHT go back / forward one second (one frame while paused), HOME goes back to the start,
+    and 1, +, -, U change the speed like in the game. The replay stops at the last frame.
     '''
+    rec = recording.Recording(filename)
+    view = Replay(rec)
+    win = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+    clock = StepClock(SPEED)
+    pygame.display.set_caption(speed_caption(SPEED))
+    paused = False
+    while True:
+        clock.wait()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
+            if event.type == pygame.KEYDOWN:
+                step = 1 if paused else StepClock.STEPS_PER_SEC
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_LEFT:
+                    frame -= step
+                elif event.key == pygame.K_RIGHT:
+                    frame += step
+                elif event.key == pygame.K_HOME:
+                    frame = 1
+                else:
+                    change_speed(event.key, clock)
+        frame = max(1, min(frame, rec.frames))
+        if clock.draw_due():
+            view.draw(win, frame)
+        if not paused and frame < rec.frames:
+            frame += 1
+
+CHECKPOINT_VERSION = 1 # change this whenever the contents of a checkpoint change
+
+# Checkpointer - a NEAT reporter that saves the whole training run every few generations, so that it can be resumed
+class Checkpointer(neat.reporting.BaseReporter):
+    '''
+    A checkpoint is written after every generation whose number is a multiple of every, once the next generation has been bred
+    and split into species. It holds everything the rest of the training run depends on:
+    - the neat.Population: the genomes, the species, the counters that number new genomes and species, the stagnation data,
+      the best genome so far and the reporters with their statistics (but not this checkpointer).
+    - the config, which also holds the counter that numbers new nodes.
+    - the state of the random module (it breeds the genomes and picks the seeds of the pipe courses) and GEN.
+    So a run resumed from a checkpoint (see restore_checkpoint()) continues exactly like the original run would have.
+
+    The file (prefix + number of generations played) is a gzip compressed pickle of a dict with a version number. It is
+    written to a temporary file first, so a machine that dies while saving never leaves a broken checkpoint behind.
+    Checkpoints are pickled, so only resume from checkpoints you trust.
+    '''
+    def __init__(self, population, every=1, prefix="flappy-checkpoint-"):
+        self.population = population
+        self.every = every
+        self.prefix = prefix
+        self.last = None # file name of the last checkpoint written
+
+    def end_generation(self, config, population, species_set):
+        if (self.population.generation + 1) % self.every == 0:
+            self.save()
+
+    def save(self):
+        p = self.population
+        state = {"version": CHECKPOINT_VERSION, "population": p, "generation": p.generation + 1, "gen": GEN, 
+                 "random": random.getstate()}
+        reporters = p.reporters.reporters
+        p.reporters.reporters = [r for r in reporters if r is not self]
+        try:
+            data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            p.reporters.reporters = reporters
+
+        filename = "{0}{1}".format(self.prefix, p.generation + 1)
+        with gzip.open(filename + ".tmp", "wb", compresslevel=5) as f:
+            f.write(data)
+        os.replace(filename + ".tmp", filename)
+        self.last = filename
+
+def restore_checkpoint(filename): # returns the neat.Population saved in a checkpoint, ready to play its next generation
+    global GEN
+    with gzip.open(filename, "rb") as f:
+        state = pickle.load(f)
+    if not isinstance(state, dict) or state.get("version") != CHECKPOINT_VERSION:
+        raise RuntimeError("{0} is not a checkpoint of this version of the game".format(filename))
+    p = state["population"]
+    p.generation = state["generation"] # the population was saved just before neat counted the generation it had finished
+    random.setstate(state["random"])
+    GEN = state["gen"]
+    return p
 
-    # set the fitness function that we are going to run for 50 generations
-    winner = p.run(main, 50) # calls main() 50 times and passes it the genomes (ie. current generation population and config file every time)
+class StopTraining(Exception): # raised by simulate() when the game window is closed
+    pass
+
+def at_least_one(text): # argparse type for the options that count frames or generations
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError("must be at least 1, not {0}".format(value))
+    return value
+
+def above_zero(text): # argparse type for the speed
+    value = float(text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError("must be greater than 0, not {0}".format(text))
+    return value
+
+def run(config_path, headless=False, workers=None, seed=None, distributed=None, timings=None, 
+        render_every=1, top_k=None, frame_skip=1, speed=1, poll_every=1, 
+        generations=50, checkpoint_every=None, checkpoint_prefix="flappy-checkpoint-", resume=None, winner_file="winner.pkl", 
+        champion_file="champion.bin", record=None, courses=1, aggregate="mean", max_frames=None, chunk_size=None, task_timeout=300):
+    global HEADLESS, EVALUATOR, RENDER_EVERY, RENDER_TOP_K, RENDER_FRAME_SKIP, SPEED, POLL_EVERY, RECORD_DIR
+    global COURSES, AGGREGATE, MAX_FRAMES
+    HEADLESS = headless # train without a window at full CPU speed
+    if render_every < 1 or frame_skip < 1:
+        raise ValueError("render_every and frame_skip must be at least 1")
+    if poll_every < 1:
+        raise ValueError("poll_every must be at least 1")
+    if speed is not None and not speed > 0:
+        raise ValueError("speed must be greater than 0 (or None for unlocked)")
+    RENDER_EVERY, RENDER_TOP_K, RENDER_FRAME_SKIP = render_every, top_k, frame_skip # what to draw in a windowed run
+    SPEED, POLL_EVERY = speed, poll_every # how fast a windowed run plays (speed None: unlocked)
+    if aggregate not in COURSE_AGGREGATES:
+        raise ValueError("unknown aggregate {0!r}".format(aggregate))
+    COURSES, AGGREGATE, MAX_FRAMES = courses, aggregate, max_frames # how every genome is scored (see simulate_courses())
+    if record is not None: # directory to record every generation to (only generations played in this process, see main())
+        if workers is not None or distributed is not None:
+            raise ValueError("generations played by worker processes cannot be recorded")
+        if courses > 1:
+            raise ValueError("generations played on several courses cannot be recorded")
+        os.makedirs(record, exist_ok=True)
+        RECORD_DIR = record
+    if seed is not None:
+        random.seed(seed) # the same seed gives the same genomes and pipe courses, so the whole run can be reproduced
+    if distributed is not None: # (host, port) to listen on for worker processes (see distributed.py)
+        from distributed import Coordinator
+        EVALUATOR = Coordinator(*distributed, chunk_size=chunk_size, task_timeout=task_timeout) # chunk_size None: one chunk per connected worker
+    elif workers is not None:
+        EVALUATOR = ParallelEvaluator(workers or None) # workers == 0 means one worker per core
+
+    if resume is not None:
+        # continue a training run from one of its checkpoints. the config and the reporters are the ones saved in the
+        # checkpoint (so config_path and timings are not used), and the run stops after the same number of generations.
+        p = restore_checkpoint(resume)
+    else:
+        # load the configuration file
+        config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, 
+                                    neat.DefaultSpeciesSet, neat.DefaultStagnation, 
+                                    config_path) # defines all the sub-headings used in the config file
+        
+        # set the population
+        p = neat.Population(config) # generates population based on the info in the config file
+        
+        # adding stats reporters / set up the output that we are going to see
+        p.add_reporter(neat.StdOutReporter(True))
+        stats = neat.StatisticsReporter()
+        p.add_reporter(stats)
+        if timings is not None: # file to write the time spent in every phase of the game loop to (see PhaseTimingReporter)
+            p.add_reporter(PhaseTimingReporter(timings))
+        '''
+        Whenever we are running the algorithm, rather than not seeing anything happen in the console, we will see
+        detailed statistics of each generation (like best fitness etc.)
+        '''
+    checkpointer = None
+    if checkpoint_every: # save the run every checkpoint_every generations (see Checkpointer)
+        checkpointer = Checkpointer(p, checkpoint_every, checkpoint_prefix)
+        p.add_reporter(checkpointer)
+
+    # set the fitness function that we are going to run for the given number of generations (minus the ones a resumed run already played)
     # it then later generates the game based on all the birds/genomes we are given.
     '''
     The way that we determine our bird's fitness is by how far it moves in the game.
     So it actually only makes sense that this main() is going to be the fitness function for our NEAT Algorithm.
     A fitness function simply sets the fitness of our bird.
     '''
+    try:
+        winner = p.run(main, generations - p.generation) # calls main() generations - p.generation times and passes it the genomes (ie. current generation population and config file every time)
+    except StopTraining: # the game window was closed
+        winner = p.best_genome
+        if checkpointer is not None and checkpointer.last is not None:
+            print("Training stopped, continue it with --resume {0}".format(checkpointer.last))
+    finally:
+        if EVALUATOR is not None: # stop the worker processes
+            EVALUATOR.close()
+            EVALUATOR = None
+
+    if winner is not None and winner_file is not None: # keep the best genome we found
+        with open(winner_file, "wb") as f:
+            pickle.dump(winner, f, protocol=pickle.HIGHEST_PROTOCOL)
+    if winner is not None and champion_file is not None: # and a version of it that plays without neat (see play())
+        export_champion(winner, p.config, champion_file)
+    return winner
 
 if __name__ == "__main__":
-    local_dir = os.path.dirname(__file__) # provides the path to the directory we are currently inside of
-    config_path = os.path.join(local_dir, "config-feedforward.txt") # absolute path to our config file
-    run(config_path)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train a NEAT population to play Flappy Bird.")
+    parser.add_argument("--headless", action="store_true", help="train without opening a window (no drawing, no frame limit)")
+    parser.add_argument("--workers", type=int, nargs="?", const=0, 
+                        help="evaluate every generation in parallel on this many processes (no value: one per core)")
+    parser.add_argument("--seed", type=int, help="seed for the random numbers, so that the whole run can be reproduced")
+    parser.add_argument("--distributed", metavar="HOST:PORT", 
+                        help="evaluate every generation on the worker processes (distributed.py) that connect to HOST:PORT")
+    parser.add_argument("--chunk-size", type=int, metavar="N", 
+                        help="genomes in every task of --distributed (default: the generation split evenly over the workers)")
+    parser.add_argument("--task-timeout", type=float, default=300, metavar="SECONDS", 
+                        help="seconds a --distributed worker gets to answer a task before the task goes to another worker")
+    parser.add_argument("--timings", metavar="FILE", help="write the time spent in every phase of every generation to FILE (.csv or .json)")
+    parser.add_argument("--render-every", type=at_least_one, default=1, metavar="N", 
+                        help="only draw every Nth generation, the others run headless at full speed")
+    parser.add_argument("--top-k", type=int, metavar="K", help="only draw the K birds closest to the centre of the next gap")
+    parser.add_argument("--frame-skip", type=at_least_one, default=1, metavar="M", help="only draw one of every M frames")
+    parser.add_argument("--speed", type=above_zero, default=1, metavar="N", 
+                        help="play a windowed run N times faster than real time (keys: 1 real time, + faster, - slower, U unlocked)")
+    parser.add_argument("--unlocked", action="store_true", help="play a windowed run as fast as possible")
+    parser.add_argument("--poll-every", type=at_least_one, default=1, metavar="K", help="only look at the window events every K steps")
+    parser.add_argument("--generations", type=int, default=50, help="number of generations to train for")
+    parser.add_argument("--checkpoint-every", type=int, metavar="N", help="save the training run every N generations")
+    parser.add_argument("--checkpoint-prefix", default="flappy-checkpoint-", metavar="PREFIX", 
+                        help="file name of the checkpoints (the number of generations played is added to it)")
+    parser.add_argument("--resume", metavar="FILE", help="continue the training run saved in the checkpoint FILE")
+    parser.add_argument("--winner", default="winner.pkl", metavar="FILE", help="save the best genome to FILE (pickled)")
+    parser.add_argument("--champion", default="champion.bin", metavar="FILE", 
+                        help="save the best genome to FILE as a standalone network (see champion.py)")
+    parser.add_argument("--play", metavar="FILE", help="do not train, watch the champion in FILE play the game")
+    parser.add_argument("--record", metavar="DIR", help="record every generation to DIR/gen-<generation>.fbr")
+    parser.add_argument("--replay", metavar="FILE", help="do not train, watch the recorded generation in FILE")
+    parser.add_argument("--replay-frame", type=int, default=1, metavar="N", help="start the replay at frame N")
+    parser.add_argument("--courses", type=int, default=1, metavar="N", 
+                        help="score every genome on N pipe courses, played at once and headless")
+    parser.add_argument("--aggregate", choices=sorted(COURSE_AGGREGATES), default="mean", 
+                        help="fitness of a genome played on several courses: its mean or its minimum fitness")
+    parser.add_argument("--max-frames", type=int, metavar="N", help="stop every game after N frames")
+    args = parser.parse_args()
+
+    distributed = None
+    if args.distributed:
+        host, port = args.distributed.rsplit(":", 1)
+        distributed = (host, int(port))
+
+    if args.play: # watch a champion play instead of training
+        SPEED, POLL_EVERY = None if args.unlocked else args.speed, args.poll_every
+        play(args.play, args.seed)
+    elif args.replay: # watch a recorded generation instead of training
+        SPEED = None if args.unlocked else args.speed
+        replay(args.replay, args.replay_frame)
+    else:
+        local_dir = os.path.dirname(__file__) # provides the path to the directory we are currently inside of
+        config_path = os.path.join(local_dir, "config-feedforward.txt") # absolute path to our config file
+        run(config_path, headless=args.headless, workers=args.workers, seed=args.seed, distributed=distributed, 
+            timings=args.timings, render_every=args.render_every, top_k=args.top_k, frame_skip=args.frame_skip, 
+            speed=None if args.unlocked else args.speed, poll_every=args.poll_every, generations=args.generations, 
+            checkpoint_every=args.checkpoint_every, checkpoint_prefix=args.checkpoint_prefix, resume=args.resume, 
+            winner_file=args.winner, champion_file=args.champion, record=args.record, courses=args.courses, 
+            aggregate=args.aggregate, max_frames=args.max_frames, chunk_size=args.chunk_size, 
+            task_timeout=args.task_timeout)
\ No newline at end of file
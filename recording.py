@@ -0,0 +1,116 @@
+# compact recordings of whole generations, so they can be replayed (see flappBird.replay()) without simulating them again
+import struct
+import zlib
+
+import numpy as np
+
+'''
+FILE FORMAT (all numbers little-endian):
+- header: magic b"FBRC", version (uint16), population size (uint32), generation (uint32), seed of the pipe course (uint64),
+  x-position of the birds (int32).
+- blocks of up to BLOCK_FRAMES frames, each one compressed with zlib on its own. A block holds, for its frames in order:
+  - alive bits: one row of bits per frame, bit i set if the bird of genome i is alive in that frame.
+  - y (float32), tilt (int8) and image index (uint8) of every bird that is alive, frame after frame, in genome order.
+- footer: number of pipes (uint32) and the (frame, height) of every pipe (uint32, int16), number of blocks (uint32) and the
+  (first frame, file offset, size) of every block (uint32, uint64, uint32), then the number of frames (uint32).
+- the file offset of the footer (uint64), as the last 8 bytes of the file.
+
+Frames are numbered from 1, like the frames of simulate(). A frame holds the birds exactly as they were drawn (after the
+flapping animation of that frame). A pipe is created at x = 700 in the frame it is recorded with (the first pipe in frame 0)
+and moves one pixel to the left every frame after that, so the pipes, the base and the score of any frame follow from the
+pipe list alone. The footer is an index: seeking to a frame only decompresses the block that holds it.
+
+Only the birds that are alive are stored, so a frame costs population / 8 bytes plus 6 bytes per bird alive (before
+compression), and recording one frame is a handful of NumPy operations.
+'''
+
+MAGIC = b"FBRC"
+VERSION = 1
+HEADER = struct.Struct("<4sHIIQi")
+BLOCK_FRAMES = 256 # frames per compressed block (seeking decompresses one block)
+
+# Recorder - writes a recording while a game is being played
+class Recorder:
+    def __init__(self, filename, population, generation, seed, bird_x):
+        self.file = open(filename, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, population, generation, seed, bird_x))
+        self.population = population
+        self.pipes = []
+        self.blocks = []
+        self.frames = 0
+        self.pending = [] # (alive bits, y, tilt, image index) of the frames of the block being filled
+
+    def pipe(self, frame, height): # a new pipe, created in frame
+        self.pipes.append((frame, height))
+
+    def frame(self, ids, y, tilt, img_index): # the birds drawn in the next frame (ids: their genome positions, in ascending order)
+        alive = np.zeros(self.population, dtype=bool)
+        alive[ids] = True
+        self.pending.append((np.packbits(alive), y.astype(np.float32), tilt.astype(np.int8), img_index.astype(np.uint8)))
+        self.frames += 1
+        if len(self.pending) == BLOCK_FRAMES:
+            self.flush()
+
+    def flush(self): # compresses and writes the frames of the block being filled
+        if not self.pending:
+            return
+        columns = list(zip(*self.pending))
+        data = b"".join(np.concatenate(column).tobytes() for column in columns)
+        data = zlib.compress(data, 1)
+        self.blocks.append((self.frames - len(self.pending) + 1, self.file.tell(), len(data)))
+        self.file.write(data)
+        self.pending = []
+
+    def close(self): # writes the last block and the footer
+        self.flush()
+        footer = self.file.tell()
+        self.file.write(struct.pack("<I", len(self.pipes)))
+        for frame, height in self.pipes:
+            self.file.write(struct.pack("<Ih", frame, height))
+        self.file.write(struct.pack("<I", len(self.blocks)))
+        for block in self.blocks:
+            self.file.write(struct.pack("<IQI", *block))
+        self.file.write(struct.pack("<IQ", self.frames, footer))
+        self.file.close()
+
+# Recording - reads a recording, frame by frame or at any frame
+class Recording:
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            self.data = f.read()
+        magic, version, self.population, self.generation, self.seed, self.bird_x = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{0} is not a recording of version {1}".format(filename, VERSION))
+
+        offset, = struct.unpack_from("<Q", self.data, len(self.data) - 8)
+        count, = struct.unpack_from("<I", self.data, offset)
+        self.pipes = [struct.unpack_from("<Ih", self.data, offset + 4 + 6*i) for i in range(count)] # (frame, height)
+        offset += 4 + 6*count
+        count, = struct.unpack_from("<I", self.data, offset)
+        self.blocks = [struct.unpack_from("<IQI", self.data, offset + 4 + 16*i) for i in range(count)] # (first frame, offset, size)
+        self.frames, = struct.unpack_from("<I", self.data, offset + 4 + 16*count)
+        self.block = None # the block decompressed last (see load_block())
+
+    def load_block(self, b): # decompresses block b into one array per field, and where every frame starts in them
+        first, offset, size = self.blocks[b]
+        frames = min(BLOCK_FRAMES, self.frames - first + 1)
+        data = zlib.decompress(self.data[offset:offset + size])
+        width = (self.population + 7) // 8
+        alive = np.unpackbits(np.frombuffer(data, np.uint8, frames * width).reshape(frames, width), axis=1, count=self.population)
+        alive = alive.astype(bool)
+        total = int(alive.sum())
+        y = np.frombuffer(data, np.float32, total, frames * width)
+        tilt = np.frombuffer(data, np.int8, total, frames * width + 4*total)
+        img_index = np.frombuffer(data, np.uint8, total, frames * width + 5*total)
+        starts = np.concatenate(([0], np.cumsum(alive.sum(axis=1))))
+        self.block = (first, frames, alive, y, tilt, img_index, starts)
+
+    def frame(self, frame): # (ids, y, tilt, image index) of the birds drawn in frame (1 to self.frames)
+        if not 1 <= frame <= self.frames:
+            raise IndexError("frame {0} is not in the recording".format(frame))
+        if self.block is None or not 0 <= frame - self.block[0] < self.block[1]:
+            self.load_block((frame - 1) // BLOCK_FRAMES)
+        first, _, alive, y, tilt, img_index, starts = self.block
+        i = frame - first
+        a, b = starts[i], starts[i + 1]
+        return np.flatnonzero(alive[i]), y[a:b], tilt[a:b], img_index[a:b]